@@ -0,0 +1,147 @@
+import json
+import math
+import threading
+import time
+
+from werkzeug.exceptions import TooManyRequests
+
+from src.cache.lru import LRUCache
+from src.cache.product_cache import LocalSharedClient
+
+
+class RateLimited(TooManyRequests):
+    description = 'Too many requests, please retry later.'
+
+
+def take_tokens(state, rate: float, burst: float, now: float, cost: float):
+    """Refills a (tokens, updated_at) bucket and takes `cost` tokens from it.
+
+    Returns the new state and the seconds to wait, 0 when the tokens were taken.
+    """
+    tokens, updated_at = state if state is not None else (burst, now)
+    tokens = min(burst, tokens + max(0.0, now - updated_at) * rate)
+    if tokens >= cost:
+        return (tokens - cost, now), 0.0
+    return (tokens, now), (cost - tokens) / rate
+
+
+class BucketStore:
+    """Interface shared by the in-process LocalBucketStore and SharedBucketStore."""
+
+    def take(self, key, rate: float, burst: float, cost: float = 1.0) -> float:
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class LocalBucketStore(BucketStore):
+    """Token buckets in an LRU map; a bucket idle long enough to refill is dropped as it equals a new one."""
+
+    def __init__(self, max_size: int = 100000, clock=time.monotonic):
+        self.clock = clock
+        self._buckets = LRUCache(max_size=max_size, clock=clock)
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, cost=1.0):
+        with self._lock:
+            now = self.clock()
+            state, wait = take_tokens(self._buckets.get(key), rate, burst, now, cost)
+            self._buckets.set(key, state, ttl=burst / rate)
+        return wait
+
+    def clear(self):
+        self._buckets.clear()
+
+
+class SharedBucketStore(BucketStore):
+    """Keeps buckets in a shared key/value client so every worker draws from the same budget.
+
+    The read-modify-write is only serialized within a process; across workers
+    a few concurrent requests may be admitted past the limit. A server-side
+    script would make it exact.
+    """
+
+    def __init__(self, client, prefix: str = 'ratelimit:', clock=time.time):
+        self.client = client
+        self.prefix = prefix
+        self.clock = clock
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, cost=1.0):
+        with self._lock:
+            value = self.client.get(self.prefix + key)
+            state, wait = take_tokens(json.loads(value) if value is not None else None, rate, burst,
+                                      self.clock(), cost)
+            self.client.set(self.prefix + key, json.dumps(state), ex=burst / rate)
+        return wait
+
+    def clear(self):
+        self.client.flushdb()
+
+
+def build_bucket_store(name: str, max_size: int):
+    if name == 'local':
+        return LocalBucketStore(max_size=max_size)
+    if name == 'shared':
+        return SharedBucketStore(LocalSharedClient(max_size=max_size))
+    raise ValueError('Unknown rate limit backend: {0}'.format(name))
+
+
+class RateLimiter:
+    """Per-client token buckets, one limit of (rate per second, burst) for each route class."""
+
+    def __init__(self, store: BucketStore, limits: dict):
+        self.store = store
+        self.limits = {route_class: limit for route_class, limit in limits.items() if limit[0] > 0}
+        self.admitted = 0
+        self.rejected = 0
+
+    def check(self, client, route_class):
+        """Raises RateLimited, with a whole-second Retry-After, once the client's bucket is empty."""
+        limit = self.limits.get(route_class)
+        if limit is None:
+            return
+        wait = self.store.take('{0}:{1}'.format(route_class, client), *limit)
+        if wait:
+            self.rejected += 1
+            raise RateLimited(retry_after=max(1, math.ceil(wait)))
+        self.admitted += 1
+
+    def clear(self):
+        self.store.clear()
+
+    def stats(self):
+        return {
+            'admitted': self.admitted,
+            'rejected': self.rejected
+        }
+
+
+class ConcurrencyLimiter:
+    """Caps how many requests of a class run at once; `limit` 0 disables the cap."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        with self._lock:
+            if self.limit and self.in_flight >= self.limit:
+                self.rejected += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def stats(self):
+        return {
+            'limit': self.limit,
+            'in_flight': self.in_flight,
+            'rejected': self.rejected
+        }
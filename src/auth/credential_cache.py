@@ -0,0 +1,39 @@
+import hashlib
+import hmac
+import os
+
+from src.cache.lru import LRUCache
+
+
+class CredentialCache:
+    """Remembers recently verified username/password pairs.
+
+    Passwords are never stored: entries are keyed on the username and an
+    HMAC of the password under a per-process secret, so a hit proves the
+    same credentials were already checked against the stored hash.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300.0, secret: bytes = None):
+        self._secret = secret or os.urandom(32)
+        self._cache = LRUCache(max_size=max_size, ttl=ttl)
+
+    def _key(self, username: str, password: str):
+        digest = hmac.new(self._secret, password.encode('utf-8'), hashlib.sha256).digest()
+        return username, digest
+
+    def is_verified(self, username: str, password: str) -> bool:
+        if not username or password is None:
+            return False
+        return self._cache.get(self._key(username, password), False)
+
+    def remember(self, username: str, password: str):
+        self._cache.set(self._key(username, password), True)
+
+    def invalidate(self, username: str):
+        return self._cache.delete_where(lambda key: key[0] == username)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
@@ -0,0 +1,111 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from passlib.context import CryptContext
+from werkzeug.exceptions import ServiceUnavailable
+
+
+class HashingPoolSaturated(ServiceUnavailable):
+    description = 'Too many password checks in progress, please retry.'
+
+
+@lru_cache(maxsize=None)
+def crypt_context(rounds: int):
+    return CryptContext(schemes=['pbkdf2_sha256'], pbkdf2_sha256__rounds=rounds)
+
+
+def hash_password(rounds, password):
+    return crypt_context(rounds).hash(password)
+
+
+def verify_password(rounds, password, password_hash):
+    return crypt_context(rounds).verify(password, password_hash)
+
+
+class PasswordHasher:
+    """Runs PBKDF2 in a process pool, rejecting work once `workers + queue_size` jobs are in flight.
+
+    With workers=0 hashing runs inline on the calling thread.
+    """
+
+    def __init__(self, rounds: int = 29000, workers: int = 0, queue_size: int = 0, timeout: float = 30.0,
+                 retry_after: int = 1):
+        self.rounds = rounds
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.rejected = 0
+        self._in_flight = 0
+        self._slots = threading.BoundedSemaphore(workers + queue_size) if workers else None
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def hash(self, password):
+        return self._run(hash_password, self.rounds, password)
+
+    def verify(self, password, password_hash):
+        return self._run(verify_password, self.rounds, password, password_hash)
+
+    def needs_update(self, password_hash):
+        try:
+            return crypt_context(self.rounds).needs_update(password_hash)
+        except ValueError:
+            return False
+
+    def start(self):
+        """Spawns the pool processes and primes their CryptContext so the first request does not pay for it."""
+        if self.workers:
+            executor = self._get_executor()
+            futures = [executor.submit(hash_password, self.rounds, 'warmup') for _ in range(self.workers)]
+            for future in futures:
+                future.result(timeout=self.timeout)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'queue_size': self.queue_size,
+            'in_flight': self._in_flight,
+            'rejected': self.rejected
+        }
+
+    def _run(self, func, *args):
+        if not self.workers:
+            return func(*args)
+
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HashingPoolSaturated(retry_after=self.retry_after)
+        with self._lock:
+            self._in_flight += 1
+        try:
+            future = self._get_executor().submit(func, *args)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return future.result(timeout=self.timeout)
+
+    def _release(self, future=None):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context(method))
+                self._pid = os.getpid()
+            return self._executor
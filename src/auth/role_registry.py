@@ -0,0 +1,42 @@
+import threading
+import time
+
+
+class RoleRegistry:
+    """Process-wide role name -> id map, reloaded when the role table version changes."""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.loaded = False
+        self.loaded_at = None
+        self.source_version = None
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    def load(self, roles, source_version=None):
+        ids = {name: role_id for role_id, name in roles}
+        with self._lock:
+            self._ids = ids
+            self.loaded = True
+            self.loaded_at = self.clock()
+            self.source_version = source_version
+
+    def clear(self):
+        with self._lock:
+            self._ids = {}
+            self.loaded = False
+            self.loaded_at = None
+            self.source_version = None
+
+    def id(self, name):
+        return self._ids.get(name)
+
+    def ids(self, names):
+        ids = self._ids
+        return frozenset(ids[name] for name in names if name in ids)
+
+    def has_role(self, role_ids, name):
+        return self._ids.get(name) in role_ids
+
+    def names(self):
+        return dict(self._ids)
@@ -0,0 +1,58 @@
+import hashlib
+import threading
+import time
+import uuid
+
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+
+class TokenIssuer:
+    """Issues short-lived HMAC-signed tokens carrying a username and its roles."""
+
+    def __init__(self, secret_key, max_age: int = 900, salt: str = 'auth-token'):
+        self.max_age = max_age
+        self._serializer = URLSafeTimedSerializer(secret_key, salt=salt,
+                                                  signer_kwargs={'digest_method': hashlib.sha256})
+
+    def issue(self, username: str, roles) -> str:
+        return self._serializer.dumps({
+            'sub': username,
+            'roles': list(roles),
+            'jti': uuid.uuid4().hex
+        })
+
+    def verify(self, token: str):
+        if not token:
+            return None
+        try:
+            claims, issued_at = self._serializer.loads(token, max_age=self.max_age, return_timestamp=True)
+        except BadSignature:
+            return None
+        claims['exp'] = issued_at.timestamp() + self.max_age
+        return claims
+
+
+class TokenDenyList:
+    """In-memory set of revoked token ids, each kept only until the token would expire anyway."""
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._revoked = {}
+        self._lock = threading.Lock()
+
+    def revoke(self, jti: str, expires_at: float):
+        with self._lock:
+            self._purge()
+            self._revoked[jti] = expires_at
+
+    def is_revoked(self, jti: str) -> bool:
+        expires_at = self._revoked.get(jti)
+        return expires_at is not None and expires_at > self.clock()
+
+    def _purge(self):
+        now = self.clock()
+        for jti in [jti for jti, expires_at in self._revoked.items() if expires_at <= now]:
+            del self._revoked[jti]
+
+    def __len__(self):
+        return len(self._revoked)
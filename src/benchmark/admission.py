@@ -0,0 +1,51 @@
+"""Measures the per-request cost of admission control on the fast path (an anonymous GET).
+
+Usage: python -m src.benchmark.admission --requests 20000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+database = os.path.join(tempfile.mkdtemp(), 'bench.db')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + database)
+
+from src.admission.limiter import RateLimiter, build_bucket_store  # noqa: E402
+from src.main import app, admit_request, release_admission  # noqa: E402
+import src.main  # noqa: E402
+
+
+def run(limiter, requests):
+    src.main.rate_limiter = limiter
+    latencies = []
+    for _ in range(requests):
+        with app.test_request_context('/product/all', method='GET'):
+            started = time.perf_counter()
+            admit_request()
+            release_admission()
+            latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return {
+        'mean_us': round(sum(latencies) / len(latencies) * 1e6, 2),
+        'p50_us': round(latencies[len(latencies) // 2] * 1e6, 2),
+        'p99_us': round(latencies[int(len(latencies) * 0.99)] * 1e6, 2)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    limits = {'default': (1e9, 1e9)}
+    print(json.dumps({
+        'requests': args.requests,
+        'disabled': run(RateLimiter(build_bucket_store('local', 1), {}), args.requests),
+        'local': run(RateLimiter(build_bucket_store('local', 100000), limits), args.requests),
+        'shared': run(RateLimiter(build_bucket_store('shared', 100000), limits), args.requests)
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Compares POST /product row by row with POST /product/bulk on SQLite.
+
+Usage: python -m src.benchmark.bulk_products --rows 2000 --batch 500
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from base64 import b64encode
+
+database = os.path.join(tempfile.mkdtemp(), 'bench.db')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + database)
+
+from src.main import app, db, User, Role  # noqa: E402
+
+
+def product_json(prefix, i):
+    return {'title': '{0}-title-{1}'.format(prefix, i), 'text': '{0}-text-{1}'.format(prefix, i),
+            'state': 'new', 'category': 'category{0}'.format(i % 10)}
+
+
+def reset_database():
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+
+def run_single(client, rows):
+    started = time.perf_counter()
+    for i in range(rows):
+        response = client.post('/product', json=product_json('single', i))
+        assert response.status_code == 200, response.data
+    return rows / (time.perf_counter() - started)
+
+
+def create_admin():
+    with app.app_context():
+        db.session.add(Role(name='user'))
+        user = User(username='admin', firstname='admin', lastname='admin', email='admin@mail.com',
+                    password=User.create_hash('password'))
+        user.roles.append(Role.get_by_name('user'))
+        user.save_db()
+    return {'Authorization': 'Basic ' + b64encode(b'admin:password').decode()}
+
+
+def run_bulk(client, rows, batch):
+    headers = create_admin()
+    started = time.perf_counter()
+    for start in range(0, rows, batch):
+        operations = [dict(product_json('bulk', i), op='create') for i in range(start, min(start + batch, rows))]
+        response = client.post('/product/bulk', json=operations, headers=headers)
+        assert response.status_code == 200, response.data
+    return rows / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--batch', type=int, default=500)
+    args = parser.parse_args()
+
+    client = app.test_client()
+    reset_database()
+    single = run_single(client, args.rows)
+    reset_database()
+    bulk = run_bulk(client, args.rows, args.batch)
+
+    print(json.dumps({
+        'database': app.config['SQLALCHEMY_DATABASE_URI'],
+        'rows': args.rows,
+        'batch': args.batch,
+        'single_rows_per_second': round(single, 1),
+        'bulk_rows_per_second': round(bulk, 1),
+        'speedup': round(bulk / single, 1)
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+"""HTTP load test for every route against a seeded SQLite database served by waitress.
+
+Usage: python -m src.benchmark.load_test --users 50 --products 10000 --concurrency 8 --requests 500
+Writes a JSON report (stdout or --output) with requests per second and p50/p95/p99 latency per route,
+so runs on different commits can be compared.
+"""
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from base64 import b64encode
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+
+database = os.path.join(tempfile.mkdtemp(), 'load_test.db')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + database)
+# Every request comes from one address, so admission control would reject most of them.
+os.environ.setdefault('RATE_LIMIT_HASHING_RATE', '0')
+os.environ.setdefault('HASHING_CONCURRENCY', '0')
+
+from waitress import create_server  # noqa: E402
+
+from src.main import app, db, User, Role, Product, UsersRoles, token_issuer  # noqa: E402
+
+PASSWORD = 'password123'
+
+
+def seed(users, products, spare):
+    """Seeds the catalog plus `spare` extra users and products per write route so PUT/DELETE never run dry."""
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add_all([Role(id=1, name='user'), Role(id=2, name='admin')])
+        password_hash = User.create_hash(PASSWORD)
+        db.session.execute(User.__table__.insert(), [
+            {'id': i, 'username': 'user{0}'.format(i), 'firstname': 'first', 'lastname': 'last',
+             'email': 'user{0}@mail.com'.format(i), 'password': password_hash}
+            for i in range(1, users + 2 * spare + 1)
+        ])
+        db.session.execute(UsersRoles.__table__.insert(), [
+            {'user_id': i, 'role_id': 2 if i == 1 else 1} for i in range(1, users + 2 * spare + 1)
+        ])
+        for start in range(1, products + spare + 1, 10000):
+            db.session.execute(Product.__table__.insert(), [
+                {'id': i, 'title': 'title{0}'.format(i), 'text': 'text{0}'.format(i),
+                 'state': 'new', 'category': 'category{0}'.format(i % 20)}
+                for i in range(start, min(start + 10000, products + spare + 1))
+            ])
+        db.session.commit()
+
+
+def start_server(threads):
+    server = create_server(app, host='127.0.0.1', port=0, threads=threads)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    return server
+
+
+def basic_auth(username):
+    credentials = b64encode('{0}:{1}'.format(username, PASSWORD).encode()).decode()
+    return {'Authorization': 'Basic ' + credentials}
+
+
+def build_routes(users, products, spare):
+    """Read routes spread over the seeded rows; PUT/DELETE /user and DELETE /product use the spare rows."""
+    sequence = count()
+
+    def product_body():
+        i = next(sequence)
+        return {'title': 'load{0}-{1}'.format(os.getpid(), i), 'text': 'load text {0}'.format(i),
+                'state': 'new', 'category': 'load'}
+
+    def signup_body():
+        i = next(sequence)
+        return {'username': 'load{0}'.format(i), 'firstname': 'first', 'lastname': 'last',
+                'email': 'load{0}@mail.com'.format(i), 'password': PASSWORD}
+
+    def user(i):
+        return 'user{0}'.format(i % users + 1)
+
+    def product_update_body(i):
+        product_id = i % products + 1
+        return {'id': product_id, 'title': 'title{0}'.format(product_id), 'text': 'text{0}'.format(product_id),
+                'state': 'used' if i % 2 else 'new', 'category': 'category{0}'.format(product_id % 20)}
+
+    def user_update_body(i):
+        return {'username': 'renamed{0}-{1}'.format(i, next(sequence)), 'firstname': 'first', 'lastname': 'last'}
+
+    def bearer_token(i):
+        return {'Authorization': 'Bearer ' + token_issuer.issue(user(i), ['user'])}
+
+    return {
+        'POST /product': lambda i: ('POST', '/product', {}, product_body()),
+        'GET /product/all': lambda i: ('GET', '/product/all?limit=100&after_id={0}'.format(i % products), {}, None),
+        'GET /product/<id>': lambda i: ('GET', '/product/{0}'.format(i % products + 1), basic_auth(user(i)), None),
+        'GET /user/<username>': lambda i: ('GET', '/user/{0}'.format(user(i)), basic_auth(user(i)), None),
+        'GET /user/id/<id>': lambda i: ('GET', '/user/id/{0}'.format(i % users + 1), basic_auth('user1'), None),
+        'POST /user': lambda i: ('POST', '/user', {}, signup_body()),
+        'POST /user/login': lambda i: ('POST', '/user/login', basic_auth(user(i)), None),
+        'POST /user/logout': lambda i: ('POST', '/user/logout', bearer_token(i), None),
+        'PUT /product': lambda i: ('PUT', '/product', {}, product_update_body(i)),
+        'DELETE /product/<id>': lambda i: ('DELETE', '/product/{0}'.format(products + i + 1), basic_auth('user1'),
+                                           None),
+        'PUT /user/<id>': lambda i: ('PUT', '/user/{0}'.format(users + i + 1), basic_auth('user1'),
+                                     user_update_body(i)),
+        'DELETE /user/<id>': lambda i: ('DELETE', '/user/{0}'.format(users + spare + i + 1), basic_auth('user1'),
+                                        None)
+    }
+
+
+class Client(threading.local):
+
+    def __init__(self, port):
+        self.connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+
+    def request(self, method, path, headers, body):
+        headers = dict(headers)
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        try:
+            self.connection.request(method, path, payload, headers)
+            response = self.connection.getresponse()
+            response.read()
+            return response.status
+        except (http.client.HTTPException, OSError):
+            self.connection.close()
+            raise
+
+
+def percentile(latencies, value):
+    if not latencies:
+        return None
+    index = max(0, int(round(value / 100 * len(latencies))) - 1)
+    return round(latencies[min(index, len(latencies) - 1)] * 1000, 3)
+
+
+def run_route(client, make_request, requests, concurrency):
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def call(i):
+        nonlocal errors
+        method, path, headers, body = make_request(i)
+        started = time.perf_counter()
+        try:
+            status = client.request(method, path, headers, body)
+        except (http.client.HTTPException, OSError):
+            status = None
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            if status is None or status >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(call, range(requests)))
+    duration = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': requests,
+        'errors': errors,
+        'requests_per_second': round(requests / duration, 1),
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99)
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(__file__)).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=500, help='requests per route')
+    parser.add_argument('--threads', type=int, default=8, help='waitress worker threads')
+    parser.add_argument('--routes', nargs='*', help='only run these routes, e.g. "GET /product/all"')
+    parser.add_argument('--output', help='write the JSON report to this file')
+    args = parser.parse_args(argv)
+
+    seed(args.users, args.products, args.requests)
+    server = start_server(args.threads)
+    client = Client(server.effective_port)
+
+    routes = build_routes(args.users, args.products, args.requests)
+    results = {}
+    try:
+        for name, make_request in routes.items():
+            if args.routes and name not in args.routes:
+                continue
+            results[name] = run_route(client, make_request, args.requests, args.concurrency)
+    finally:
+        server.close()
+
+    report = json.dumps({
+        'revision': git_revision(),
+        'database': app.config['SQLALCHEMY_DATABASE_URI'],
+        'users': args.users,
+        'products': args.products,
+        'concurrency': args.concurrency,
+        'threads': args.threads,
+        'routes': results
+    }, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(report)
+    print(report)
+
+
+if __name__ == '__main__':
+    main()
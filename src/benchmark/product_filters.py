@@ -0,0 +1,74 @@
+"""Measures filtered /product/all latency on a large SQLite catalog, with and without the index.
+
+Usage: python -m src.benchmark.product_filters --rows 1000000 --requests 200
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+database = os.path.join(tempfile.mkdtemp(), 'bench.db')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + database)
+
+from src.main import app, db, Product  # noqa: E402
+
+CATEGORIES = ['category{0}'.format(i) for i in range(50)]
+STATES = ['new', 'used', 'refurbished', 'broken']
+
+
+def seed_products(rows, chunk_size=50000):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        for start in range(0, rows, chunk_size):
+            db.session.execute(Product.__table__.insert(), [
+                {'title': 'title{0}'.format(i), 'text': 'text{0}'.format(i),
+                 'state': STATES[i % len(STATES)], 'category': CATEGORIES[i % len(CATEGORIES)]}
+                for i in range(start, min(start + chunk_size, rows))
+            ])
+            db.session.commit()
+
+
+def measure(client, requests, limit):
+    latencies = []
+    for _ in range(requests):
+        url = '/product/all?category={0}&state={1}&limit={2}'.format(
+            random.choice(CATEGORIES), random.choice(STATES), limit)
+        started = time.perf_counter()
+        response = client.get(url)
+        latencies.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, response.data
+    latencies.sort()
+    return {
+        'p50_ms': round(statistics.median(latencies), 3),
+        'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1], 3),
+        'max_ms': round(latencies[-1], 3)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=100)
+    args = parser.parse_args()
+
+    random.seed(0)
+    seed_products(args.rows)
+    client = app.test_client()
+    indexed = measure(client, args.requests, args.limit)
+
+    with app.app_context():
+        db.session.execute(db.text('DROP INDEX ix_product_category_state'))
+        db.session.commit()
+    unindexed = measure(client, args.requests, args.limit)
+
+    print(json.dumps({'rows': args.rows, 'requests': args.requests, 'limit': args.limit,
+                      'indexed': indexed, 'unindexed': unindexed}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Compares per-request body validation: a freshly built reqparse parser against a precompiled Schema.
+
+Usage: python -m src.benchmark.request_validation --requests 20000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+database = os.path.join(tempfile.mkdtemp(), 'bench.db')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + database)
+
+from flask_restful import reqparse  # noqa: E402
+
+from src.main import app, CREATE_USER_SCHEMA  # noqa: E402
+
+BODY = {'username': 'username', 'firstname': 'firstname', 'lastname': 'lastname',
+        'email': 'username@mail.com', 'password': 'password123'}
+
+
+def reqparse_validate():
+    parser = reqparse.RequestParser()
+    parser.add_argument('username', help='username cannot be blank', required=True)
+    parser.add_argument('firstname', help='firstname cannot be blank', required=True)
+    parser.add_argument('lastname', help='lastName cannot be blank', required=True)
+    parser.add_argument('email', help='email cannot be blank', required=True)
+    parser.add_argument('password', help='password cannot be blank', required=True)
+    return parser.parse_args()
+
+
+def schema_validate():
+    data, error = CREATE_USER_SCHEMA.parse()
+    return data
+
+
+def run(validate, requests):
+    payload = json.dumps(BODY)
+    latencies = []
+    for _ in range(requests):
+        with app.test_request_context('/user', method='POST', data=payload, content_type='application/json'):
+            started = time.perf_counter()
+            validate()
+            latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return {
+        'mean_us': round(sum(latencies) / len(latencies) * 1e6, 2),
+        'p50_us': round(latencies[len(latencies) // 2] * 1e6, 2),
+        'p99_us': round(latencies[int(len(latencies) * 0.99)] * 1e6, 2)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    baseline = run(reqparse_validate, args.requests)
+    compiled = run(schema_validate, args.requests)
+    print(json.dumps({
+        'requests': args.requests,
+        'reqparse': baseline,
+        'schema': compiled,
+        'speedup': round(baseline['mean_us'] / compiled['mean_us'], 1)
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+import json
+import threading
+import time
+
+from src.cache.lru import LRUCache
+
+
+class CacheBackend:
+    """Interface shared by the in-process LRUCache and SharedCacheBackend."""
+
+    def get(self, key, default=None):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl: float = None):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def stats(self):
+        raise NotImplementedError
+
+
+class LocalSharedClient:
+    """In-process stand-in for a shared key/value server (get, set with expiry, delete)."""
+
+    def __init__(self, max_size: int = 10000, clock=time.monotonic):
+        self.max_size = max_size
+        self.clock = clock
+        self.evictions = 0
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= self.clock():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key, value, ex: float = None):
+        with self._lock:
+            if key not in self._data and len(self._data) >= self.max_size:
+                del self._data[next(iter(self._data))]
+                self.evictions += 1
+            self._data[key] = (value, self.clock() + ex if ex else None)
+
+    def delete(self, key):
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def flushdb(self):
+        with self._lock:
+            self._data.clear()
+
+    def dbsize(self):
+        return len(self._data)
+
+
+class SharedCacheBackend(CacheBackend):
+    """Stores JSON-encoded values in a shared client so every worker sees the same entries."""
+
+    def __init__(self, client, ttl: float = 60.0, prefix: str = 'cache:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        value = self.client.get(self.prefix + key)
+        if value is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return json.loads(value)
+
+    def set(self, key, value, ttl: float = None):
+        self.client.set(self.prefix + key, json.dumps(value), ex=self.ttl if ttl is None else ttl)
+
+    def delete(self, key):
+        return self.client.delete(self.prefix + key)
+
+    def clear(self):
+        self.client.flushdb()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': getattr(self.client, 'evictions', 0),
+            'size': self.client.dbsize(),
+            'hit_ratio': self.hits / lookups if lookups else 0.0
+        }
+
+
+def build_cache_backend(name: str, max_size: int, ttl: float):
+    if name == 'local':
+        return LRUCache(max_size=max_size, ttl=ttl)
+    if name == 'shared':
+        return SharedCacheBackend(LocalSharedClient(max_size=max_size), ttl=ttl)
+    raise ValueError('Unknown cache backend: {0}'.format(name))
+
+
+class ProductCache:
+    """Serialized products by id, plus a title -> id index checked against the cached row."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def get(self, product_id):
+        return self.backend.get('product:id:{0}'.format(product_id))
+
+    def get_by_title(self, title):
+        product_id = self.backend.get('product:title:{0}'.format(title))
+        if product_id is None:
+            return None
+        product_json = self.get(product_id)
+        if product_json is None or product_json['title'] != title:
+            return None
+        return product_json
+
+    def set(self, product_json):
+        self.backend.set('product:id:{0}'.format(product_json['id']), product_json)
+        self.backend.set('product:title:{0}'.format(product_json['title']), product_json['id'])
+
+    def invalidate(self, product_id):
+        self.backend.delete('product:id:{0}'.format(product_id))
+
+    def invalidate_title(self, title):
+        self.backend.delete('product:title:{0}'.format(title))
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        return self.backend.stats()
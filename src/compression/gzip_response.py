@@ -0,0 +1,50 @@
+import gzip
+import zlib
+
+
+class GzipCompressor:
+    """Gzips responses the client accepts; streamed bodies are compressed chunk by chunk."""
+
+    def __init__(self, min_size: int = 500, level: int = 6,
+                 mimetypes=('application/json', 'application/x-ndjson', 'text/plain', 'text/html')):
+        self.min_size = min_size
+        self.level = level
+        self.mimetypes = frozenset(mimetypes)
+
+    def compress(self, response, accept_encodings):
+        if response.mimetype not in self.mimetypes:
+            return response
+        response.vary.add('Accept-Encoding')
+
+        if response.status_code < 200 or response.status_code in (204, 206, 304) or \
+                'Content-Encoding' in response.headers or accept_encodings.quality('gzip') <= 0:
+            return response
+
+        if response.is_streamed:
+            response.response = self.stream(response.response, response.charset)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            response.set_data(gzip.compress(data, self.level))
+        response.headers['Content-Encoding'] = 'gzip'
+        if response.get_etag()[0]:
+            response.set_etag(response.get_etag()[0], weak=True)
+        return response
+
+    def stream(self, chunks, charset='utf-8'):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode(charset)
+                if not chunk:
+                    continue
+                data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+                if data:
+                    yield data
+            yield compressor.flush()
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
@@ -0,0 +1,26 @@
+import re
+
+from sqlalchemy.sql.expression import Delete
+
+
+def returning_supported(session, statement):
+    """Whether the bind for an UPDATE or DELETE can return rows (SQLAlchemy 2.0 flags, else 1.4 full_returning)."""
+    dialect = session.get_bind(clause=statement).dialect
+    kind = 'delete_returning' if isinstance(statement, Delete) else 'update_returning'
+    return getattr(dialect, kind, dialect.full_returning)
+
+
+def execute_returning(session, statement, columns):
+    """Runs a single-row UPDATE or DELETE; returns (matched, row), row being None without RETURNING support."""
+    if returning_supported(session, statement):
+        row = session.execute(statement.returning(*columns)).first()
+        return row is not None, row
+    return session.execute(statement).rowcount > 0, None
+
+
+def unique_violation(error, columns):
+    """Which of `columns` an IntegrityError names, going by the first line of the driver message."""
+    message = (str(error.orig).splitlines() or [''])[0]
+    pattern = r'(?<![a-z0-9])({0})(?![a-z0-9])'.format('|'.join(map(re.escape, columns)))
+    matches = list(re.finditer(pattern, message))
+    return matches[-1].group(1) if matches else None
@@ -0,0 +1,68 @@
+import random
+import time
+
+from flask_sqlalchemy.session import Session
+
+from src.cache.lru import LRUCache
+from src.database.pool import engine_options
+
+REPLICA_PREFIX = 'replica'
+
+
+def replica_binds(urls: str, environ):
+    """SQLALCHEMY_BINDS entries, with pool options, for a comma-separated list of replica URLs."""
+    urls = [url.strip() for url in urls.split(',') if url.strip()]
+    return {'{0}_{1}'.format(REPLICA_PREFIX, i): dict(engine_options(url, environ), url=url)
+            for i, url in enumerate(urls)}
+
+
+def is_write(clause):
+    return clause is not None and (getattr(clause, 'is_dml', False) or
+                                   getattr(clause, '_for_update_arg', None) is not None)
+
+
+class RoutingSession(Session):
+    """Sends reads to a replica bind while info['read_only'] is set.
+
+    Flushes and DML always go to the primary, and once a session has written
+    it stays on the primary so it reads its own uncommitted changes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.info.get('read_only'):
+            if self._flushing or is_write(clause):
+                self.info['read_only'] = False
+            else:
+                replica = self.replica_engine()
+                if replica is not None:
+                    return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def reads_from_replica(self):
+        return bool(self.info.get('read_only')) and self.replica_engine() is not None
+
+    def replica_engine(self):
+        engines = self._db.engines
+        if 'replica' not in self.info:
+            keys = sorted(key for key in engines if key and key.startswith(REPLICA_PREFIX))
+            self.info['replica'] = random.choice(keys) if keys else None
+        key = self.info['replica']
+        return engines[key] if key is not None else None
+
+
+class ReadYourWrites:
+    """Remembers clients that wrote within the last `window` seconds so their reads stay on the primary."""
+
+    def __init__(self, window: float = 5.0, max_size: int = 10000, clock=time.monotonic):
+        self.window = window
+        self._recent = LRUCache(max_size=max_size, ttl=window, clock=clock)
+
+    def record(self, client):
+        if self.window > 0:
+            self._recent.set(client, True)
+
+    def is_recent(self, client):
+        return self._recent.get(client, False)
+
+    def clear(self):
+        self._recent.clear()
@@ -1,11 +1,15 @@
 import uuid
 from sys import exc_info as stack_trace
 
+from werkzeug.exceptions import HTTPException
+
 
 def handle_server_exception(func):
     def wrapper(*args, **kwargs):
         try:
             return func(*args, **kwargs)
+        except HTTPException:
+            raise
         except BaseException as e:
             return {
                        'traceId': str(uuid.uuid1()),
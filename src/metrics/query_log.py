@@ -0,0 +1,76 @@
+import logging
+import re
+from collections import Counter
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LISTS = re.compile(r'\(\s*(?:\?|%s|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%s|%\(\w+\)s|:\w+))*\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize(statement: str) -> str:
+    """Reduces a statement to its shape: literals and IN-lists collapse to a single placeholder."""
+    statement = _LITERALS.sub('?', statement)
+    statement = _PLACEHOLDER_LISTS.sub('(?)', statement)
+    return _WHITESPACE.sub(' ', statement).strip()
+
+
+class SlowQueryLog:
+
+    def __init__(self, threshold_ms: float, log=logger, max_parameters_length: int = 200):
+        self.threshold = threshold_ms / 1000
+        self.log = log
+        self.max_parameters_length = max_parameters_length
+
+    def record(self, statement, parameters, seconds: float, route=None):
+        if seconds < self.threshold:
+            return False
+        self.log.warning('Slow query (%.1f ms) on %s: %s; parameters: %s', seconds * 1000, route or '-',
+                         _WHITESPACE.sub(' ', statement).strip(), repr(parameters)[:self.max_parameters_length])
+        return True
+
+
+class RepeatedQueryDetector:
+    """Flags statements issued more than `threshold` times with the same shape in one request."""
+
+    def __init__(self, threshold: int, log=logger):
+        self.threshold = threshold
+        self.log = log
+
+    def check(self, shapes: Counter, route=None):
+        repeated = [(statement, count) for statement, count in shapes.most_common() if count > self.threshold]
+        for statement, count in repeated:
+            self.log.warning('Possible N+1 on %s: %d identical statements: %s', route or '-', count, statement)
+        return repeated
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(engine, max_queries: int = None, max_repeated: int = None):
+    """Fails with QueryBudgetExceeded when the block issues more statements than allowed."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+    if max_queries is not None and len(statements) > max_queries:
+        raise QueryBudgetExceeded('{0} queries issued, budget is {1}:\n{2}'.format(
+            len(statements), max_queries, '\n'.join(statements)))
+    if max_repeated is not None:
+        statement, count = (Counter(normalize(statement) for statement in statements).most_common(1) or [(None, 0)])[0]
+        if count > max_repeated:
+            raise QueryBudgetExceeded('{0} identical statements issued, budget is {1}: {2}'.format(
+                count, max_repeated, statement))
@@ -0,0 +1,135 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), self.counts):
+            total += bucket_count
+            yield bound, total
+
+
+class RequestTimer:
+    """Per-request accumulator for SQL, auth and other named phases."""
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.started = clock()
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.phases = {}
+
+    def add_query(self, seconds: float):
+        self.sql_count += 1
+        self.sql_seconds += seconds
+
+    def add(self, name: str, seconds: float):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    @contextmanager
+    def measure(self, name: str):
+        started = self.clock()
+        try:
+            yield
+        finally:
+            self.add(name, self.clock() - started)
+
+    def elapsed(self):
+        return self.clock() - self.started
+
+    def server_timing(self, total: float):
+        entries = ['db;dur={0:.3f};desc="{1} queries"'.format(self.sql_seconds * 1000, self.sql_count)]
+        entries += ['{0};dur={1:.3f}'.format(name, seconds * 1000) for name, seconds in sorted(self.phases.items())]
+        entries.append('total;dur={0:.3f}'.format(total * 1000))
+        return ', '.join(entries)
+
+
+class RequestMetrics:
+    """Latency histograms and SQL/phase totals per route, rendered in Prometheus text format."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def observe(self, route: str, method: str, status: int, timer: RequestTimer, total: float):
+        with self._lock:
+            entry = self._routes.get((route, method))
+            if entry is None:
+                entry = self._routes[(route, method)] = {
+                    'latency': Histogram(self.buckets), 'statuses': {}, 'sql_count': 0, 'sql_seconds': 0.0,
+                    'phases': {}
+                }
+            entry['latency'].observe(total)
+            entry['statuses'][status] = entry['statuses'].get(status, 0) + 1
+            entry['sql_count'] += timer.sql_count
+            entry['sql_seconds'] += timer.sql_seconds
+            for name, seconds in timer.phases.items():
+                entry['phases'][name] = entry['phases'].get(name, 0.0) + seconds
+
+    def reset(self):
+        with self._lock:
+            self._routes = {}
+
+    def render(self, gauges=None):
+        lines = []
+        with self._lock:
+            routes = sorted(self._routes.items())
+
+            lines += ['# HELP http_request_duration_seconds Request latency by route.',
+                      '# TYPE http_request_duration_seconds histogram']
+            for (route, method), entry in routes:
+                labels = 'route="{0}",method="{1}"'.format(route, method)
+                for bound, total in entry['latency'].cumulative():
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append('http_request_duration_seconds_bucket{{{0},le="{1}"}} {2}'.format(labels, le, total))
+                lines.append('http_request_duration_seconds_sum{{{0}}} {1}'.format(labels, entry['latency'].sum))
+                lines.append('http_request_duration_seconds_count{{{0}}} {1}'.format(labels, entry['latency'].count))
+
+            lines += ['# HELP http_responses_total Responses by route and status.',
+                      '# TYPE http_responses_total counter']
+            for (route, method), entry in routes:
+                for status, total in sorted(entry['statuses'].items()):
+                    lines.append('http_responses_total{{route="{0}",method="{1}",status="{2}"}} {3}'
+                                 .format(route, method, status, total))
+
+            lines += ['# HELP http_request_sql_queries_total SQL statements issued by route.',
+                      '# TYPE http_request_sql_queries_total counter']
+            lines += ['http_request_sql_queries_total{{route="{0}",method="{1}"}} {2}'
+                      .format(route, method, entry['sql_count']) for (route, method), entry in routes]
+
+            lines += ['# HELP http_request_sql_seconds_total Time spent in SQL by route.',
+                      '# TYPE http_request_sql_seconds_total counter']
+            lines += ['http_request_sql_seconds_total{{route="{0}",method="{1}"}} {2}'
+                      .format(route, method, entry['sql_seconds']) for (route, method), entry in routes]
+
+            lines += ['# HELP http_request_phase_seconds_total Time spent in named phases (auth, ...) by route.',
+                      '# TYPE http_request_phase_seconds_total counter']
+            for (route, method), entry in routes:
+                for name, seconds in sorted(entry['phases'].items()):
+                    lines.append('http_request_phase_seconds_total{{route="{0}",method="{1}",phase="{2}"}} {3}'
+                                 .format(route, method, name, seconds))
+
+        for prefix, stats in sorted((gauges or {}).items()):
+            for name, value in sorted(stats.items()):
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append('# TYPE {0}_{1} gauge'.format(prefix, name))
+                    lines.append('{0}_{1} {2}'.format(prefix, name, value))
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,134 @@
+import heapq
+import math
+import re
+import threading
+import time
+from collections import Counter
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text: str):
+    return TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+class InvertedIndex:
+    """Term -> {document id: weighted term frequency}, ranked with BM25.
+
+    Title terms count twice. Queries match documents containing every term and
+    walk the postings of the rarest term first, so the work depends on how many
+    documents match rather than on the size of the catalog.
+    """
+
+    k1 = 1.2
+    b = 0.75
+    title_weight = 2
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.loaded = False
+        self.loaded_at = None
+        self.source_version = None
+        self.local_writes = 0
+        self._postings = {}
+        self._documents = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def load(self, documents, source_version=None):
+        with self._lock:
+            self._postings = {}
+            self._documents = {}
+            self._total_length = 0
+            for doc_id, title, text in documents:
+                self._add(doc_id, title, text)
+            self.loaded = True
+            self.loaded_at = self.clock()
+            self.source_version = source_version
+            self.local_writes = 0
+
+    def clear(self):
+        with self._lock:
+            self.loaded = False
+            self._postings = {}
+            self._documents = {}
+            self._total_length = 0
+
+    def note_write(self):
+        """Counts a committed write whose changes were already applied through add/remove."""
+        with self._lock:
+            if self.loaded:
+                self.local_writes += 1
+
+    def is_current(self, source_version):
+        """Whether every change up to `source_version` is one this index already applied."""
+        with self._lock:
+            return self.loaded and self.source_version is not None and \
+                source_version == self.source_version + self.local_writes
+
+    def mark_current(self, source_version):
+        with self._lock:
+            self.source_version = source_version
+            self.local_writes = 0
+            self.loaded_at = self.clock()
+
+    def add(self, doc_id, title, text):
+        with self._lock:
+            if self.loaded:
+                self._remove(doc_id)
+                self._add(doc_id, title, text)
+
+    def remove(self, doc_id):
+        with self._lock:
+            if self.loaded:
+                self._remove(doc_id)
+
+    def _add(self, doc_id, title, text):
+        terms = Counter()
+        for token in tokenize(title):
+            terms[token] += self.title_weight
+        for token in tokenize(text):
+            terms[token] += 1
+        length = sum(terms.values())
+        self._documents[doc_id] = (terms, length)
+        self._total_length += length
+        for token, frequency in terms.items():
+            self._postings.setdefault(token, {})[doc_id] = frequency
+
+    def _remove(self, doc_id):
+        document = self._documents.pop(doc_id, None)
+        if document is None:
+            return
+        terms, length = document
+        self._total_length -= length
+        for token in terms:
+            postings = self._postings[token]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[token]
+
+    def search(self, query: str, limit: int = 20, offset: int = 0):
+        terms = set(tokenize(query))
+        with self._lock:
+            if not terms or not self._documents:
+                return [], 0
+            postings = sorted((self._postings.get(term, {}) for term in terms), key=len)
+            if not postings[0]:
+                return [], 0
+
+            matches = [doc_id for doc_id in postings[0] if all(doc_id in other for other in postings[1:])]
+            count = len(self._documents)
+            average_length = self._total_length / count
+            idf = [math.log(1 + (count - len(p) + 0.5) / (len(p) + 0.5)) for p in postings]
+
+            def score(doc_id):
+                length = self._documents[doc_id][1]
+                norm = self.k1 * (1 - self.b + self.b * length / average_length)
+                return sum(weight * p[doc_id] * (self.k1 + 1) / (p[doc_id] + norm)
+                           for weight, p in zip(idf, postings))
+
+            ranked = heapq.nlargest(offset + limit, ((score(doc_id), -doc_id, doc_id) for doc_id in matches))
+            return [(doc_id, round(value, 6)) for value, _, doc_id in ranked[offset:]], len(matches)
+
+    def __len__(self):
+        return len(self._documents)
@@ -0,0 +1,44 @@
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson; calls with json.dumps-specific arguments fall back to the stdlib."""
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self._dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._dumps(obj) + b'\n', mimetype=self.mimetype)
+
+    def _dumps(self, obj):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option)
+
+
+def build_json_provider(app, name: str):
+    if name == 'auto':
+        name = 'default' if orjson is None else 'orjson'
+    if name == 'default':
+        return DefaultJSONProvider(app)
+    if name == 'orjson':
+        if orjson is None:
+            raise ValueError('The orjson JSON provider needs the orjson package.')
+        return OrjsonProvider(app)
+    raise ValueError('Unknown JSON provider: {0}'.format(name))
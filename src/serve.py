@@ -0,0 +1,130 @@
+"""Production entry point: python -m src.serve [--port 8080] [--threads 8] [--workers 1]
+
+Every option can also be set through the environment (WAITRESS_THREADS, WAITRESS_CONNECTION_LIMIT,
+WAITRESS_CHANNEL_TIMEOUT, WAITRESS_BACKLOG, SERVER_WORKERS, SERVER_ALLOW_LOCAL_STATE, HOST, PORT).
+
+Forked workers do not share the token deny list, credential cache, product cache or role registry, so a
+logout or user change handled by one worker is not seen by the others until entries expire. --workers > 1
+is refused unless --allow-local-state acknowledges that.
+"""
+import argparse
+import atexit
+import os
+import signal
+import socket
+
+from sqlalchemy import text
+from waitress import serve
+
+from src.auth.password_hasher import crypt_context
+from src.main import app, db, sync_role_registry, password_hasher
+
+
+def parse_args(argv=None, environ=os.environ):
+    parser = argparse.ArgumentParser(description='Serve the shop API with waitress.')
+    parser.add_argument('--host', default=environ.get('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(environ.get('PORT', 8080)))
+    parser.add_argument('--threads', type=int, default=int(environ.get('WAITRESS_THREADS', 8)))
+    parser.add_argument('--connection-limit', type=int, default=int(environ.get('WAITRESS_CONNECTION_LIMIT', 200)))
+    parser.add_argument('--channel-timeout', type=int, default=int(environ.get('WAITRESS_CHANNEL_TIMEOUT', 30)))
+    parser.add_argument('--backlog', type=int, default=int(environ.get('WAITRESS_BACKLOG', 1024)))
+    parser.add_argument('--workers', type=int, default=int(environ.get('SERVER_WORKERS', 1)),
+                        help='number of forked worker processes sharing the listening socket; each keeps its '
+                             'own token deny list and caches, see --allow-local-state')
+    parser.add_argument('--allow-local-state', action='store_true',
+                        default=environ.get('SERVER_ALLOW_LOCAL_STATE', '').lower() in ('1', 'true', 'yes'),
+                        help='run several workers even though revoked tokens and deleted or renamed users stay '
+                             'valid in the other workers until the token expires or CREDENTIAL_CACHE_TTL passes')
+    parser.add_argument('--no-warmup', dest='warmup', action='store_false')
+    args = parser.parse_args(argv)
+    if args.workers > 1 and not args.allow_local_state:
+        parser.error('--workers > 1 keeps the token deny list and credential cache per process; '
+                     'pass --allow-local-state to accept that')
+    return args
+
+
+def waitress_options(args):
+    return {
+        'threads': args.threads,
+        'connection_limit': args.connection_limit,
+        'channel_timeout': args.channel_timeout,
+        'backlog': args.backlog
+    }
+
+
+def warmup():
+    with app.app_context():
+        db.session.execute(text('SELECT 1'))
+        sync_role_registry()
+        db.session.remove()
+    context = crypt_context(app.config['PASSWORD_HASH_ROUNDS'])
+    context.verify('warmup', context.hash('warmup'))
+
+
+def start_password_hasher():
+    password_hasher.start()
+    atexit.register(password_hasher.shutdown)
+
+
+def dispose_engines(close=True):
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=close)
+
+
+def listen(host, port, backlog):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    return sock
+
+
+def run_prefork(args):
+    sock = listen(args.host, args.port, args.backlog)
+    dispose_engines()
+
+    children = []
+    for _ in range(args.workers):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            dispose_engines(close=False)
+            if args.warmup:
+                start_password_hasher()
+            try:
+                serve(app, sockets=[sock], **waitress_options(args))
+            finally:
+                password_hasher.shutdown()
+            os._exit(0)
+        children.append(pid)
+
+    def stop(signum, frame):
+        for child in children:
+            try:
+                os.kill(child, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for child in children:
+        os.waitpid(child, 0)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.warmup:
+        warmup()
+
+    if args.workers > 1:
+        run_prefork(args)
+    else:
+        if args.warmup:
+            start_password_hasher()
+        serve(app, host=args.host, port=args.port, **waitress_options(args))
+
+
+if __name__ == '__main__':
+    main()
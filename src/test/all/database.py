@@ -0,0 +1,58 @@
+from base64 import b64encode
+from contextlib import contextmanager
+from unittest import TestCase
+
+from src.main import app, db, User, Role, Product, credential_cache, product_cache, product_index, \
+    role_registry, read_your_writes, rate_limiter
+from src.metrics.query_log import query_budget
+
+
+class DatabaseTestCase(TestCase):
+    """Runs requests through the test client against a throwaway SQLite schema."""
+
+    def setUp(self) -> None:
+        with app.app_context():
+            db.create_all()
+            db.session.add_all([Role(name='user'), Role(name='admin')])
+            db.session.commit()
+        credential_cache.clear()
+        product_cache.clear()
+        product_index.clear()
+        role_registry.clear()
+        read_your_writes.clear()
+        rate_limiter.clear()
+        self.client = app.test_client()
+
+    def tearDown(self) -> None:
+        with app.app_context():
+            db.drop_all()
+
+    def create_user(self, username, password='password', roles=('user',)):
+        with app.app_context():
+            user = User(username=username, firstname='firstname', lastname='lastname',
+                        email=username + '@mail.com', password=User.create_hash(password))
+            for name in roles:
+                user.roles.append(Role.get_by_name(name))
+            user.save_db()
+            return user.id
+
+    def create_product(self, title, text=None, state='new', category='electronics'):
+        with app.app_context():
+            product = Product(title=title, text=text or title + ' text', state=state, category=category)
+            product.save_db()
+            return product.id
+
+    @staticmethod
+    def basic_auth(username, password='password'):
+        credentials = b64encode('{0}:{1}'.format(username, password).encode()).decode()
+        return {'Authorization': 'Basic ' + credentials}
+
+    @contextmanager
+    def query_budget(self, max_queries=None, max_repeated=None):
+        with app.app_context():
+            engine = db.engine
+        with query_budget(engine, max_queries=max_queries, max_repeated=max_repeated) as statements:
+            yield statements
+
+    def count_queries(self):
+        return self.query_budget()
@@ -0,0 +1,95 @@
+from unittest import TestCase
+from src.cache.lru import LRUCache
+from src.auth.credential_cache import CredentialCache
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLRUCache(TestCase):
+
+    def setUp(self) -> None:
+        self.clock = FakeClock()
+        self.cache = LRUCache(max_size=2, ttl=10, clock=self.clock)
+
+    def test_get_and_set(self):
+        self.cache.set('a', 1)
+
+        self.assertEqual(1, self.cache.get('a'))
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(1, self.cache.hits)
+        self.assertEqual(1, self.cache.misses)
+
+    def test_expired_entry_is_dropped(self):
+        self.cache.set('a', 1)
+        self.clock.now = 11
+
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(0, len(self.cache))
+
+    def test_least_recently_used_is_evicted(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.get('a')
+        self.cache.set('c', 3)
+
+        self.assertEqual(1, self.cache.get('a'))
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(1, self.cache.evictions)
+
+    def test_delete_where(self):
+        self.cache.set(('user', 1), True)
+        self.cache.set(('other', 1), True)
+
+        result = self.cache.delete_where(lambda key: key[0] == 'user')
+
+        self.assertEqual(1, result)
+        self.assertIsNone(self.cache.get(('user', 1)))
+
+    def test_stats(self):
+        self.cache.set('a', 1)
+        self.cache.get('a')
+        self.cache.get('b')
+
+        result = self.cache.stats()
+
+        self.assertEqual({'hits': 1, 'misses': 1, 'evictions': 0, 'size': 1,
+                          'max_size': 2, 'hit_ratio': 0.5}, result)
+
+
+class TestCredentialCache(TestCase):
+
+    def setUp(self) -> None:
+        self.cache = CredentialCache(max_size=8, ttl=60)
+
+    def test_remember(self):
+        self.cache.remember('username', 'password')
+
+        self.assertTrue(self.cache.is_verified('username', 'password'))
+        self.assertFalse(self.cache.is_verified('username', 'wrong'))
+        self.assertFalse(self.cache.is_verified('other', 'password'))
+
+    def test_password_is_not_stored(self):
+        self.cache.remember('username', 'password')
+
+        keys = list(self.cache._cache._entries)
+
+        self.assertNotIn('password', keys[0])
+        self.assertNotEqual(b'password', keys[0][1])
+
+    def test_invalidate(self):
+        self.cache.remember('username', 'password')
+        self.cache.remember('username', 'password2')
+        self.cache.remember('other', 'password')
+
+        result = self.cache.invalidate('username')
+
+        self.assertEqual(2, result)
+        self.assertFalse(self.cache.is_verified('username', 'password'))
+        self.assertTrue(self.cache.is_verified('other', 'password'))
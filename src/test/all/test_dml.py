@@ -0,0 +1,56 @@
+from unittest import TestCase, mock
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, delete, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from src.database.dml import returning_supported, unique_violation
+
+user = Table('user', MetaData(), Column('id', Integer, primary_key=True), Column('username', String(50)),
+             Column('email', String(50)))
+
+
+def session_for(dialect):
+    session = mock.Mock()
+    session.get_bind.return_value.dialect = dialect
+    return session
+
+
+def integrity_error(message):
+    return IntegrityError('INSERT INTO user', {}, Exception(message))
+
+
+class TestReturningSupported(TestCase):
+
+    def test_postgresql(self):
+        session = session_for(postgresql.dialect())
+
+        self.assertTrue(returning_supported(session, update(user).where(user.c.id == 1)))
+        self.assertTrue(returning_supported(session, delete(user).where(user.c.id == 1)))
+
+    def test_sqlite(self):
+        self.assertFalse(returning_supported(session_for(sqlite.dialect()), delete(user).where(user.c.id == 1)))
+
+
+class TestUniqueViolation(TestCase):
+
+    def test_sqlite_message(self):
+        error = integrity_error('UNIQUE constraint failed: user.email')
+
+        self.assertEqual('email', unique_violation(error, ('username', 'email')))
+
+    def test_mysql_message(self):
+        error = integrity_error("(1062, \"Duplicate entry 'email' for key 'user.username'\")")
+
+        self.assertEqual('username', unique_violation(error, ('username', 'email')))
+
+    def test_postgresql_message(self):
+        error = integrity_error('duplicate key value violates unique constraint "user_email_key"\n'
+                                'DETAIL:  Key (email)=(username@mail.com) already exists.')
+
+        self.assertEqual('email', unique_violation(error, ('username', 'email')))
+
+    def test_unknown_constraint(self):
+        error = integrity_error('NOT NULL constraint failed: user.password')
+
+        self.assertIsNone(unique_violation(error, ('username', 'email')))
@@ -0,0 +1,86 @@
+import gzip
+import zlib
+from unittest import TestCase
+
+from flask import Response
+from werkzeug.datastructures import Accept
+from werkzeug.http import parse_accept_header
+
+from src.compression.gzip_response import GzipCompressor
+
+
+def accept(value):
+    return parse_accept_header(value, Accept)
+
+
+class TestGzipCompressor(TestCase):
+
+    def setUp(self) -> None:
+        self.compressor = GzipCompressor(min_size=100)
+        self.body = b'{"products":[' + b','.join(b'{"id":%d}' % i for i in range(100)) + b']}'
+
+    def test_compress(self):
+        response = self.compressor.compress(Response(self.body, mimetype='application/json'), accept('gzip, br'))
+
+        self.assertEqual('gzip', response.headers['Content-Encoding'])
+        self.assertEqual(self.body, gzip.decompress(response.get_data()))
+        self.assertEqual(str(len(response.get_data())), response.headers['Content-Length'])
+        self.assertIn('Accept-Encoding', response.vary)
+
+    def test_not_accepted(self):
+        for value in ('', 'br', 'gzip;q=0'):
+            response = self.compressor.compress(Response(self.body, mimetype='application/json'), accept(value))
+
+            self.assertNotIn('Content-Encoding', response.headers)
+            self.assertEqual(self.body, response.get_data())
+            self.assertIn('Accept-Encoding', response.vary)
+
+    def test_wildcard(self):
+        response = self.compressor.compress(Response(self.body, mimetype='application/json'), accept('*'))
+
+        self.assertEqual('gzip', response.headers['Content-Encoding'])
+
+    def test_below_min_size(self):
+        response = self.compressor.compress(Response(b'{}', mimetype='application/json'), accept('gzip'))
+
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertIn('Accept-Encoding', response.vary)
+
+    def test_other_mimetypes(self):
+        response = self.compressor.compress(Response(self.body, mimetype='image/png'), accept('gzip'))
+
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertNotIn('Accept-Encoding', response.vary)
+
+    def test_not_modified(self):
+        response = self.compressor.compress(Response(self.body, status=304, mimetype='application/json'),
+                                            accept('gzip'))
+
+        self.assertNotIn('Content-Encoding', response.headers)
+
+    def test_etag_becomes_weak(self):
+        response = Response(self.body, mimetype='application/json')
+        response.set_etag('product-1-1')
+
+        self.compressor.compress(response, accept('gzip'))
+
+        self.assertEqual(('product-1-1', True), response.get_etag())
+
+    def test_stream(self):
+        chunks = []
+
+        def generate():
+            for i in range(3):
+                chunks.append(i)
+                yield '{"id":%d}\n' % i
+
+        response = Response(generate(), mimetype='application/x-ndjson')
+        self.compressor.compress(response, accept('gzip'))
+
+        iterator = iter(response.response)
+        first = next(iterator)
+        self.assertEqual([0], chunks)
+        self.assertEqual(b'{"id":0}\n', zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(first))
+        body = first + b''.join(iterator)
+        self.assertEqual(b'{"id":0}\n{"id":1}\n{"id":2}\n', gzip.decompress(body))
+        self.assertNotIn('Content-Length', response.headers)
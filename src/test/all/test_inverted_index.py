@@ -0,0 +1,69 @@
+from unittest import TestCase
+from src.search.inverted_index import InvertedIndex, tokenize
+
+
+class TestInvertedIndex(TestCase):
+
+    def setUp(self) -> None:
+        self.index = InvertedIndex()
+        self.index.load([
+            (1, 'Red lamp', 'A small desk lamp'),
+            (2, 'Lamp shade', 'Red fabric shade for a floor lamp'),
+            (3, 'Plug', 'European power plug')
+        ], source_version=7)
+
+    def test_tokenize(self):
+        self.assertEqual(['red', 'desk', 'lamp', '2'], tokenize('Red, desk-LAMP #2'))
+
+    def test_search_matches_all_terms(self):
+        result, total = self.index.search('red lamp')
+
+        self.assertEqual([1, 2], [doc_id for doc_id, _ in result])
+        self.assertEqual(2, total)
+
+    def test_search_ranks_title_matches_higher(self):
+        result, _ = self.index.search('shade')
+
+        self.assertEqual([2], [doc_id for doc_id, _ in result])
+        self.assertGreater(self.index.search('red')[0][0][1], 0)
+
+    def test_search_with_pagination(self):
+        first, total = self.index.search('lamp', limit=1)
+        second, _ = self.index.search('lamp', limit=1, offset=1)
+
+        self.assertEqual(2, total)
+        self.assertNotEqual(first, second)
+
+    def test_search_without_matches(self):
+        self.assertEqual(([], 0), self.index.search('kettle'))
+        self.assertEqual(([], 0), self.index.search(''))
+
+    def test_add_replaces_document(self):
+        self.index.add(3, 'Red kettle', 'Electric kettle')
+
+        self.assertEqual([3], [doc_id for doc_id, _ in self.index.search('kettle')[0]])
+        self.assertEqual(([], 0), self.index.search('plug'))
+
+    def test_remove(self):
+        self.index.remove(1)
+
+        self.assertEqual([2], [doc_id for doc_id, _ in self.index.search('red')[0]])
+        self.assertEqual(2, len(self.index))
+
+    def test_changes_are_ignored_until_loaded(self):
+        self.index.clear()
+        self.index.add(4, 'Kettle', 'Electric kettle')
+
+        self.assertFalse(self.index.loaded)
+        self.assertEqual(0, len(self.index))
+
+    def test_local_writes_keep_index_current(self):
+        self.index.add(4, 'Kettle', 'Electric kettle')
+        self.index.note_write()
+
+        self.assertTrue(self.index.is_current(8))
+        self.assertFalse(self.index.is_current(9))
+
+        self.index.mark_current(9)
+        self.assertTrue(self.index.is_current(9))
+        self.assertEqual(0, self.index.local_writes)
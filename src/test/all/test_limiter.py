@@ -0,0 +1,118 @@
+from unittest import TestCase
+
+from src.admission.limiter import take_tokens, LocalBucketStore, SharedBucketStore, RateLimiter, RateLimited, \
+    ConcurrencyLimiter, build_bucket_store
+from src.cache.product_cache import LocalSharedClient
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTakeTokens(TestCase):
+
+    def test_new_bucket_starts_full(self):
+        state, wait = take_tokens(None, rate=1, burst=3, now=10, cost=1)
+
+        self.assertEqual(((2, 10), 0.0), (state, wait))
+
+    def test_empty_bucket_reports_wait(self):
+        state, wait = take_tokens((0.5, 10), rate=2, burst=3, now=10, cost=1)
+
+        self.assertEqual((0.5, 10), state)
+        self.assertEqual(0.25, wait)
+
+    def test_refill_is_capped_at_burst(self):
+        state, wait = take_tokens((0, 10), rate=1, burst=3, now=100, cost=1)
+
+        self.assertEqual((2, 100), state)
+
+
+class TestBucketStores(TestCase):
+
+    def setUp(self) -> None:
+        self.clock = FakeClock()
+        self.stores = [LocalBucketStore(clock=self.clock),
+                       SharedBucketStore(LocalSharedClient(clock=self.clock), clock=self.clock)]
+
+    def test_burst_then_refill(self):
+        for store in self.stores:
+            self.assertEqual([0.0, 0.0, 0.5], [store.take('client', rate=2, burst=2) for _ in range(3)])
+
+            self.clock.now += 0.5
+
+            self.assertEqual(0.0, store.take('client', rate=2, burst=2))
+
+    def test_keys_are_independent(self):
+        for store in self.stores:
+            store.take('a', rate=1, burst=1)
+
+            self.assertEqual(0.0, store.take('b', rate=1, burst=1))
+
+    def test_clear(self):
+        for store in self.stores:
+            store.take('client', rate=1, burst=1)
+            store.clear()
+
+            self.assertEqual(0.0, store.take('client', rate=1, burst=1))
+
+    def test_shared_store_is_seen_by_every_worker(self):
+        client = LocalSharedClient(clock=self.clock)
+        workers = [SharedBucketStore(client, clock=self.clock), SharedBucketStore(client, clock=self.clock)]
+
+        self.assertEqual(0.0, workers[0].take('client', rate=1, burst=1))
+        self.assertEqual(1.0, workers[1].take('client', rate=1, burst=1))
+
+    def test_build_bucket_store(self):
+        self.assertIsInstance(build_bucket_store('local', 10), LocalBucketStore)
+        self.assertIsInstance(build_bucket_store('shared', 10), SharedBucketStore)
+        with self.assertRaises(ValueError):
+            build_bucket_store('redis', 10)
+
+
+class TestRateLimiter(TestCase):
+
+    def setUp(self) -> None:
+        self.clock = FakeClock()
+        self.limiter = RateLimiter(LocalBucketStore(clock=self.clock), {'hashing': (0.5, 1), 'default': (0, 0)})
+
+    def test_rejects_with_retry_after(self):
+        self.limiter.check('127.0.0.1', 'hashing')
+
+        with self.assertRaises(RateLimited) as context:
+            self.limiter.check('127.0.0.1', 'hashing')
+
+        self.assertEqual(2, context.exception.retry_after)
+        self.assertEqual({'admitted': 1, 'rejected': 1}, self.limiter.stats())
+
+    def test_clients_have_separate_buckets(self):
+        self.limiter.check('127.0.0.1', 'hashing')
+        self.limiter.check('127.0.0.2', 'hashing')
+
+    def test_unlimited_classes(self):
+        for _ in range(10):
+            self.limiter.check('127.0.0.1', 'default')
+            self.limiter.check('127.0.0.1', 'unknown')
+
+        self.assertEqual({'admitted': 0, 'rejected': 0}, self.limiter.stats())
+
+
+class TestConcurrencyLimiter(TestCase):
+
+    def test_limit(self):
+        limiter = ConcurrencyLimiter(2)
+
+        self.assertEqual([True, True, False], [limiter.acquire() for _ in range(3)])
+        limiter.release()
+        self.assertTrue(limiter.acquire())
+        self.assertEqual({'limit': 2, 'in_flight': 2, 'rejected': 1}, limiter.stats())
+
+    def test_disabled(self):
+        limiter = ConcurrencyLimiter(0)
+
+        self.assertTrue(all(limiter.acquire() for _ in range(100)))
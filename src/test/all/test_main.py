@@ -1,9 +1,23 @@
-from unittest import TestCase, mock
+import gzip
+import os
+import tempfile
+import resource
+import tracemalloc
+from unittest import TestCase, mock, skipUnless
 from src.main import User, Product, product, update_product, product_by_id, create_user, \
     user_by_nickname3, update_user_by_id, delete_user_by_id, delete_product_by_id
 from src.main import User, Role
 from undecorated import undecorated
-from src.main import verify_password, get_user_roles, hello, Role
+from src.main import verify_password, get_user_roles, hello, Role, credential_cache
+from src.main import product_cache
+from src.main import products_query, product_index, request_metrics, slow_query_log, repeated_query_detector
+from src.main import password_hasher, role_registry, TableVersion, read_your_writes, rate_limiter, hashing_admission
+from src.main import ProductChange
+from src.auth.password_hasher import HashingPoolSaturated, crypt_context
+from src.main import app, db, verify_token, get_token_roles, login, logout, token_issuer, token_deny_list
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
+from src.test.all.database import DatabaseTestCase
 
 
 class TestAuth(TestCase):
@@ -19,6 +33,7 @@ class TestAuth(TestCase):
 
         self.user.roles.append(Role(id=1, name='user'))
         self.user.roles.append(Role(id=2, name='admin'))
+        credential_cache.clear()
 
     @mock.patch('src.main.User.check_hash')
     @mock.patch('src.main.User.get_by_username')
@@ -31,6 +46,33 @@ class TestAuth(TestCase):
 
         self.assertEqual('username', result)
 
+    @mock.patch('src.main.User.check_hash')
+    @mock.patch('src.main.User.get_by_username')
+    def test_verify_password_uses_credential_cache(self, mock_get_by_username, mock_check_hash):
+        mock_get_by_username.return_value = self.user
+        mock_check_hash.return_value = True
+
+        undecorated_verify_password = undecorated(verify_password)
+        undecorated_verify_password('username', 'password')
+        result = undecorated_verify_password('username', 'password')
+
+        self.assertEqual('username', result)
+        mock_get_by_username.assert_called_once_with('username')
+        mock_check_hash.assert_called_once_with('password', 'password')
+
+    @mock.patch('src.main.User.check_hash')
+    @mock.patch('src.main.User.get_by_username')
+    def test_verify_password_does_not_cache_failures(self, mock_get_by_username, mock_check_hash):
+        mock_get_by_username.return_value = self.user
+        mock_check_hash.return_value = False
+
+        undecorated_verify_password = undecorated(verify_password)
+        undecorated_verify_password('username', 'wrong')
+        result = undecorated_verify_password('username', 'wrong')
+
+        self.assertIsNone(result)
+        self.assertEqual(2, mock_check_hash.call_count)
+
     @mock.patch('src.main.User.get_by_username')
     def test_get_user_roles(self, mock_get_by_username):
         mock_get_by_username.return_value = self.user
@@ -40,6 +82,56 @@ class TestAuth(TestCase):
 
         self.assertEqual(['user', 'admin'], result)
 
+    def test_verify_token(self):
+        token = token_issuer.issue('username', ['user'])
+
+        with app.test_request_context():
+            result = verify_token(token)
+            roles = get_token_roles(result)
+
+        self.assertEqual('username', result)
+        self.assertEqual(['user'], roles)
+
+    def test_verify_token_with_invalid_token(self):
+        with app.test_request_context():
+            result = verify_token('not-a-token')
+
+        self.assertIsNone(result)
+
+    def test_verify_token_with_revoked_token(self):
+        token = token_issuer.issue('username', ['user'])
+        claims = token_issuer.verify(token)
+        token_deny_list.revoke(claims['jti'], claims['exp'])
+
+        with app.test_request_context():
+            result = verify_token(token)
+
+        self.assertIsNone(result)
+
+    @mock.patch('src.main.User.get_by_username')
+    @mock.patch('flask_httpauth.HTTPBasicAuth.current_user')
+    def test_login(self, mock_current_user, mock_get_by_username):
+        mock_current_user.return_value = 'username'
+        mock_get_by_username.return_value = self.user
+
+        with app.test_request_context(method='POST'):
+            result = undecorated(login)().get_json()
+
+        claims = token_issuer.verify(result['token'])
+        self.assertEqual('username', claims['sub'])
+        self.assertEqual(['user', 'admin'], claims['roles'])
+        self.assertEqual(token_issuer.max_age, result['expires_in'])
+
+    def test_logout_revokes_token(self):
+        token = token_issuer.issue('username', ['user'])
+
+        with app.test_request_context(method='POST', headers={'Authorization': 'Bearer ' + token}):
+            result = logout().get_json()
+            verified = verify_token(token)
+
+        self.assertEqual({'Success': 'You successfully logged out'}, result)
+        self.assertIsNone(verified)
+
     def test_hello(self):
         undecorated_hello = undecorated(hello)
         result = undecorated_hello()
@@ -57,9 +149,10 @@ class TestRole(TestCase):
 
         self.assertEqual(expected_json, result)
 
+    @mock.patch('src.main.TableVersion.bump')
     @mock.patch('src.main.db.session.commit')
     @mock.patch('src.main.db.session.add')
-    def test_save_to_db(self, mock_add, mock_commit):
+    def test_save_to_db(self, mock_add, mock_commit, mock_bump):
         role = Role(id=1, name='user')
 
         mock_add.return_value = None
@@ -68,6 +161,7 @@ class TestRole(TestCase):
         Role.save_to_db(role)
 
         mock_add.assert_called_once_with(role)
+        mock_bump.assert_called_once_with('role')
         mock_commit.assert_called_once_with()
 
     @mock.patch('flask_sqlalchemy.model._QueryProperty.__get__')
@@ -82,6 +176,9 @@ class TestRole(TestCase):
 
 class TestProduct(TestCase):
 
+    def setUp(self) -> None:
+        product_cache.clear()
+
     def test_save(self):
         product = Product(id=1, title="plug", text="goody",
                           state="new", category="electronics")
@@ -127,25 +224,6 @@ class TestProduct(TestCase):
 
         self.assertEqual(product, result)
 
-    @mock.patch('src.main.db.session.commit')
-    @mock.patch('flask_sqlalchemy.model._QueryProperty.__get__')
-    @mock.patch('src.main.Product.get_by_id')
-    def test_delete(self, mock_get_by_id, mock_query_property_getter, mock_commit):
-        product = Product(id=1, title="plug", text="goody",
-                          state="new", category="electronics")
-        mock_get_by_id.return_value = product
-        mock_query_property_getter.return_value.filter_by.return_value.delete.return_value = None
-        mock_commit.return_value = None
-
-        result = Product.delete(1)
-
-        self.assertEqual(product.save(), result)
-        mock_get_by_id.assert_called_once_with(1)
-        mock_query_property_getter.return_value.filter_by.assert_called_once_with(id=1)
-        mock_query_property_getter.return_value.filter_by.return_value.delete.assert_called_once_with()
-        mock_commit.assert_called_once_with()
-
-
 class TestUser(TestCase):
 
     def setUp(self) -> None:
@@ -220,19 +298,6 @@ class TestUser(TestCase):
 
         self.assertEqual(user, result)
 
-    @mock.patch('src.main.db.session.commit')
-    @mock.patch('flask_sqlalchemy.model._QueryProperty.__get__')
-    @mock.patch('src.main.User.get_by_id')
-    def test_delete_2(self, mock_get_by_id, mock_query_property_getter, mock_commit):
-        mock_get_by_id.return_value = self.user
-        mock_query_property_getter.return_value.filter_by.return_value.delete.return_value = None
-        mock_commit.return_value = None
-
-        result = User.delete(1)
-
-        self.assertEqual(result, User.save(self.user))
-
-
 class TestProducts(TestCase):
 
     def setUp(self) -> None:
@@ -270,30 +335,28 @@ class TestProducts(TestCase):
         }
 
     @mock.patch('src.main.Product.save_db')
-    @mock.patch('flask_restful.reqparse.RequestParser.parse_args')
+    @mock.patch('src.validation.schema.Schema.parse')
     def test_product_create(self, mock_request_parser, mock_save_db):
-        mock_request_parser.return_value = self.product_json_create
+        mock_request_parser.return_value = self.product_json_create, None
         mock_save_db.return_value = True
         undecorated_product = undecorated(product)
         result = undecorated_product()
 
         self.assertEqual(({'message': 'Product was successfully created'}, 200), result)
 
-    @mock.patch('src.main.Product.save_db')
-    @mock.patch('src.main.Product.save')
-    @mock.patch('flask_restful.reqparse.RequestParser.parse_args')
-    def test_update_product(self, mock_request_parser, mock_save_to_db, mock_save):
-        mock_request_parser.return_value = self.update_product_json
-        mock_save_to_db.return_value = True
-        mock_save.return_value = Product.save(self.product)
+    @mock.patch('src.main.db.session.rollback')
+    @mock.patch('src.main.execute_returning')
+    @mock.patch('src.validation.schema.Schema.parse')
+    def test_update_product(self, mock_request_parser, mock_execute_returning, mock_rollback):
+        mock_request_parser.return_value = self.update_product_json, None
+        mock_execute_returning.side_effect = IntegrityError('UPDATE product', {}, Exception(
+            'UNIQUE constraint failed: product.title'))
 
         undecorated_update_product = undecorated(update_product)
         result = undecorated_update_product()
 
-        self.get_product_json['username'], self.get_product_json['first_name'], self.get_product_json[
-            'last_name'] = 'new', 'new', 'new'
-
-        self.assertEqual(({'message': 'Product name or description is alredy taken'}, 500), result)
+        self.assertEqual(({'message': 'Product name or description is already taken'}, 500), result)
+        mock_rollback.assert_called_once_with()
 
     @mock.patch('src.main.Product.get_by_id')
     def test_product_by_id(self, mock_product_by_id):
@@ -323,11 +386,11 @@ class TestProducts(TestCase):
 
     @mock.patch('src.main.Product.delete')
     @mock.patch('src.main.Product.get_by_id')
-    @mock.patch('src.main.Role.get_by_name')
+    @mock.patch('src.main.sync_role_registry')
     @mock.patch('src.main.User.get_by_username')
-    @mock.patch('flask_httpauth.HTTPAuth.current_user')
-    def test_delete_product_by_id(self, mock_current_user, mock_get_by_username, mock_get_by_name, mock_get_by_id,
-                                  mock_delete):
+    @mock.patch('flask_httpauth.MultiAuth.current_user')
+    def test_delete_product_by_id(self, mock_current_user, mock_get_by_username, mock_sync_role_registry,
+                                  mock_get_by_id, mock_delete):
         mock_current_user.return_value = 'username'
         mock_get_by_id.return_value = self.product
         mock_delete.return_value = Product.save(self.product)
@@ -387,21 +450,21 @@ class TestUsers(TestCase):
         }
 
     @mock.patch('src.main.User.save_db')
-    @mock.patch('src.main.Role.get_by_name')
+    @mock.patch('src.main.Role.from_registry')
     @mock.patch('src.main.User.get_by_username')
     @mock.patch('src.main.User.create_hash')
-    @mock.patch('flask_restful.reqparse.RequestParser.parse_args')
-    def test_create_user(self, mock_request_parser, mock_create_hash, mock_get_by_username, mock_get_by_name,
+    @mock.patch('src.validation.schema.Schema.parse')
+    def test_create_user(self, mock_request_parser, mock_create_hash, mock_get_by_username, mock_from_registry,
                          mock_save_db):
-        mock_request_parser.return_value = self.user_json_create
+        mock_request_parser.return_value = self.user_json_create, None
         mock_create_hash.return_value = 'password'
-        mock_get_by_username.return_value = False
-        mock_get_by_name.return_value = Role(id=1, name='user')
+        mock_from_registry.return_value = Role(id=1, name='user')
         mock_save_db.return_value = True
 
         result = create_user()
 
         self.assertEqual(({'message': 'User was successfully created'}, 200), result)
+        mock_get_by_username.assert_not_called()
 
     @mock.patch('src.main.User.get_by_username')
     def test_user_by_username(self, mock_get_by_username):
@@ -424,11 +487,11 @@ class TestUsers(TestCase):
                            'traceId': result[0].get('traceId')}, 404), result)
 
     @mock.patch('src.main.User.create_hash')
-    @mock.patch('flask_restful.reqparse.RequestParser.parse_args')
+    @mock.patch('src.validation.schema.Schema.parse')
     def test_create_user_with_email_check_fail(self, mock_request_parser, mock_create_hash):
         self.user_json_create['email'] = 'invalid'
 
-        mock_request_parser.return_value = self.user_json_create
+        mock_request_parser.return_value = self.user_json_create, None
         mock_create_hash.return_value = 'password'
 
         result = create_user()
@@ -436,13 +499,14 @@ class TestUsers(TestCase):
         self.assertEqual(({'errors': [{'message': 'Please, enter valid email address.',
                                        'source': "Field 'email' in the request body."}],
                            'traceId': result[0].get('traceId')}, 400), result)
+        mock_create_hash.assert_not_called()
 
     @mock.patch('src.main.User.create_hash')
-    @mock.patch('flask_restful.reqparse.RequestParser.parse_args')
+    @mock.patch('src.validation.schema.Schema.parse')
     def test_create_user_with_password_check_fail(self, mock_request_parser, mock_create_hash):
         self.user_json_create['password'] = 'pass'
 
-        mock_request_parser.return_value = self.user_json_create
+        mock_request_parser.return_value = self.user_json_create, None
         mock_create_hash.return_value = 'password'
 
         result = create_user()
@@ -450,27 +514,34 @@ class TestUsers(TestCase):
         self.assertEqual(({'errors': [{'message': 'Password should consist of at least 8 symbols.',
                                        'source': "Field 'password' in the request body."}],
                            'traceId': result[0].get('traceId')}, 400), result)
+        mock_create_hash.assert_not_called()
 
-    @mock.patch('src.main.User.get_by_username')
+    @mock.patch('src.main.db.session.rollback')
+    @mock.patch('src.main.User.save_db')
+    @mock.patch('src.main.Role.from_registry')
     @mock.patch('src.main.User.create_hash')
-    @mock.patch('flask_restful.reqparse.RequestParser.parse_args')
-    def test_create_user_with_username_check_fail(self, mock_request_parser, mock_create_hash, mock_get_by_username):
-        mock_request_parser.return_value = self.user_json_create
+    @mock.patch('src.validation.schema.Schema.parse')
+    def test_create_user_with_username_check_fail(self, mock_request_parser, mock_create_hash, mock_from_registry,
+                                                  mock_save_db, mock_rollback):
+        mock_request_parser.return_value = self.user_json_create, None
         mock_create_hash.return_value = 'password'
-        mock_get_by_username.return_value = True
+        mock_from_registry.return_value = Role(id=1, name='user')
+        mock_save_db.side_effect = IntegrityError('INSERT INTO user', {}, Exception(
+            'UNIQUE constraint failed: user.username'))
 
         result = create_user()
 
         self.assertEqual(({'errors': [{'message': 'User with such username already exists.',
                                        'source': "Field 'username' in the request body."}],
                            'traceId': result[0].get('traceId')}, 400), result)
+        mock_rollback.assert_called_once()
 
     @mock.patch('src.main.User.save_db')
     @mock.patch('src.main.User.get_by_id')
     @mock.patch('src.main.User.get_by_username')
-    @mock.patch('flask_restful.reqparse.RequestParser.parse_args')
+    @mock.patch('src.validation.schema.Schema.parse')
     def test_update_user_by_id(self, mock_request_parser, mock_get_by_username, mock_get_by_id, mock_save_db):
-        mock_request_parser.return_value = self.update_user_json
+        mock_request_parser.return_value = self.update_user_json, None
         mock_get_by_username.return_value = None
         mock_get_by_id.return_value = self.user
         mock_save_db.return_value = True
@@ -490,9 +561,9 @@ class TestUsers(TestCase):
                           'username': 'new'}, result)
 
     @mock.patch('src.main.User.get_by_username')
-    @mock.patch('flask_restful.reqparse.RequestParser.parse_args')
+    @mock.patch('src.validation.schema.Schema.parse')
     def test_update_user_by_id_with_invalid_id(self, mock_request_parser, mock_get_by_username):
-        mock_request_parser.return_value = self.update_user_json
+        mock_request_parser.return_value = self.update_user_json, None
         mock_get_by_username.return_value = self.user
 
         undecorated_update_user_by_id = undecorated(update_user_by_id)
@@ -504,9 +575,9 @@ class TestUsers(TestCase):
 
     @mock.patch('src.main.User.get_by_id')
     @mock.patch('src.main.User.get_by_username')
-    @mock.patch('flask_restful.reqparse.RequestParser.parse_args')
+    @mock.patch('src.validation.schema.Schema.parse')
     def test_update_user_by_id_with_invalid_username(self, mock_request_parser, mock_get_by_username, mock_get_by_id):
-        mock_request_parser.return_value = self.update_user_json
+        mock_request_parser.return_value = self.update_user_json, None
         mock_get_by_username.return_value = None
         mock_get_by_id.return_value = None
 
@@ -525,3 +596,1188 @@ class TestUsers(TestCase):
         result = undecorated_delete_user_by_id(1)
 
         self.assertEqual(self.get_user_json, result)
+
+    @mock.patch('src.main.User.delete')
+    def test_delete_user_by_id_invalidates_credentials(self, mock_delete):
+        mock_delete.return_value = self.get_user_json
+        credential_cache.remember('username', 'password')
+
+        undecorated_delete_user_by_id = undecorated(delete_user_by_id)
+        undecorated_delete_user_by_id(1)
+
+        self.assertFalse(credential_cache.is_verified('username', 'password'))
+
+    @mock.patch('src.main.User.save_db')
+    @mock.patch('src.main.User.get_by_id')
+    @mock.patch('src.main.User.get_by_username')
+    @mock.patch('src.validation.schema.Schema.parse')
+    def test_update_user_by_id_invalidates_credentials(self, mock_request_parser, mock_get_by_username,
+                                                       mock_get_by_id, mock_save_db):
+        mock_request_parser.return_value = self.update_user_json, None
+        mock_get_by_username.return_value = None
+        mock_get_by_id.return_value = self.user
+        credential_cache.remember('username', 'password')
+
+        undecorated_update_user_by_id = undecorated(update_user_by_id)
+        undecorated_update_user_by_id(1)
+
+        self.assertFalse(credential_cache.is_verified('username', 'password'))
+
+
+
+class TestIdentityQueries(DatabaseTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.create_user('username', roles=('user', 'admin'))
+        self.product_id = self.create_product('plug')
+
+    def test_user_by_username_loads_identity_once(self):
+        with self.count_queries() as statements:
+            response = self.client.get('/user/username', headers=self.basic_auth('username'))
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(1, len(statements))
+
+    def test_product_by_id_loads_identity_once(self):
+        with self.count_queries() as statements:
+            response = self.client.get('/product/{0}'.format(self.product_id), headers=self.basic_auth('username'))
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(2, len(statements))
+
+    def test_identity_is_loaded_with_roles(self):
+        with self.count_queries() as statements:
+            response = self.client.get('/api/v1/hello-world-29', headers=self.basic_auth('username'))
+
+        self.assertEqual(b'Hello World 29', response.data)
+        self.assertEqual(1, len(statements))
+        self.assertIn('JOIN', statements[0])
+
+    def test_cached_credentials_still_load_identity_once(self):
+        self.client.get('/user/username', headers=self.basic_auth('username'))
+
+        with self.count_queries() as statements:
+            response = self.client.get('/user/username', headers=self.basic_auth('username'))
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(1, len(statements))
+
+    def test_wrong_password_is_rejected(self):
+        response = self.client.get('/user/username', headers=self.basic_auth('username', 'wrong'))
+
+        self.assertEqual(401, response.status_code)
+
+
+class TestLogin(DatabaseTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.create_user('username')
+
+    def test_login_with_password(self):
+        response = self.client.post('/user/login', headers=self.basic_auth('username'))
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('username', token_issuer.verify(response.json['token'])['sub'])
+
+    def test_token_cannot_renew_itself(self):
+        token = self.client.post('/user/login', headers=self.basic_auth('username')).json['token']
+
+        response = self.client.post('/user/login', headers={'Authorization': 'Bearer ' + token})
+
+        self.assertEqual(401, response.status_code)
+
+
+class TestProductPagination(DatabaseTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.product_ids = [self.create_product('product{0}'.format(i)) for i in range(5)]
+
+    def test_get_all_products_without_parameters(self):
+        response = self.client.get('/product/all')
+
+        result = response.get_json()
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(self.product_ids, [product['id'] for product in result['products']])
+        self.assertEqual({'id': self.product_ids[0], 'title': 'product0', 'text': 'product0 text',
+                          'state': 'new', 'category': 'electronics'}, result['products'][0])
+        self.assertIsNone(result['next_after_id'])
+
+    def test_get_all_products_by_pages(self):
+        first = self.client.get('/product/all?limit=2').get_json()
+        second = self.client.get('/product/all?limit=2&after_id={0}'.format(first['next_after_id'])).get_json()
+        last = self.client.get('/product/all?limit=2&after_id={0}'.format(second['next_after_id'])).get_json()
+
+        self.assertEqual(self.product_ids[:2], [product['id'] for product in first['products']])
+        self.assertEqual(self.product_ids[2:4], [product['id'] for product in second['products']])
+        self.assertEqual(self.product_ids[4:], [product['id'] for product in last['products']])
+        self.assertIsNone(last['next_after_id'])
+
+    def test_get_all_products_with_fields(self):
+        with self.count_queries() as statements:
+            result = self.client.get('/product/all?limit=1&fields=title,state').get_json()
+
+        self.assertEqual([{'id': self.product_ids[0], 'title': 'product0', 'state': 'new'}], result['products'])
+        self.assertNotIn('category', statements[0])
+
+    def test_get_all_products_with_invalid_limit(self):
+        response = self.client.get('/product/all?limit=0')
+
+        self.assertEqual(400, response.status_code)
+        self.assertEqual("Field 'limit' in query parameters.", response.get_json()['errors'][0]['source'])
+
+    def test_get_all_products_with_unicode_digits(self):
+        limit = self.client.get('/product/all?limit=%C2%B2')
+        after_id = self.client.get('/product/all?after_id=%C2%B2')
+        search = self.client.get('/product/search?q=a&limit=%C2%B2')
+
+        self.assertEqual((400, 400, 400), (limit.status_code, after_id.status_code, search.status_code))
+        self.assertEqual("Field 'after_id' in query parameters.", after_id.get_json()['errors'][0]['source'])
+
+    def test_get_all_products_with_unknown_field(self):
+        response = self.client.get('/product/all?fields=title,price')
+
+        self.assertEqual(400, response.status_code)
+        self.assertEqual('Unknown product fields: price.', response.get_json()['errors'][0]['message'])
+
+
+class TestProductExport(DatabaseTestCase):
+
+    def seed_products(self, count, chunk_size=10000):
+        with app.app_context():
+            for start in range(0, count, chunk_size):
+                db.session.execute(Product.__table__.insert(), [
+                    {'title': 'title{0}'.format(i), 'text': 'text{0}'.format(i), 'state': 'new', 'category': 'c'}
+                    for i in range(start, min(start + chunk_size, count))
+                ])
+            db.session.commit()
+
+    def export_line_count(self, url='/product/export'):
+        response = self.client.get(url)
+        return response, sum(chunk.count(b'\n') for chunk in response.response)
+
+    def test_export_products(self):
+        self.create_product('plug')
+        self.create_product('lamp', category='light')
+
+        response = self.client.get('/product/export?fields=title,category')
+
+        self.assertEqual('application/x-ndjson', response.mimetype)
+        self.assertEqual(b'{"id":1,"title":"plug","category":"electronics"}\n'
+                         b'{"id":2,"title":"lamp","category":"light"}\n', response.data)
+
+    def test_export_products_streams_in_chunks(self):
+        self.seed_products(20000)
+
+        tracemalloc.start()
+        try:
+            response, count = self.export_line_count()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(20000, count)
+        self.assertLess(peak, 5 * 1024 * 1024)
+
+    @skipUnless(os.environ.get('RUN_SLOW_TESTS'), 'generates a 1M-row table')
+    def test_export_products_memory_is_bounded_at_one_million_rows(self):
+        self.seed_products(1000000)
+
+        max_rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        response, count = self.export_line_count()
+        max_rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        self.assertEqual(1000000, count)
+        self.assertLess(max_rss_after - max_rss_before, 50 * 1024)
+
+
+class TestProductCache(DatabaseTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.create_user('username')
+        self.product_id = self.create_product('plug')
+
+    def get_product(self):
+        return self.client.get('/product/{0}'.format(self.product_id), headers=self.basic_auth('username'))
+
+    def test_product_by_id_is_cached(self):
+        self.get_product()
+
+        with self.count_queries() as statements:
+            response = self.get_product()
+
+        self.assertEqual('plug', response.get_json()['title'])
+        self.assertFalse([statement for statement in statements if 'FROM product' in statement])
+        self.assertEqual(1, product_cache.stats()['hits'])
+
+    def test_get_by_title_is_cached(self):
+        with app.app_context():
+            Product.get_by_title('plug')
+
+            with self.count_queries() as statements:
+                result = Product.get_by_title('plug')
+
+        self.assertEqual(self.product_id, result.id)
+        self.assertEqual([], statements)
+
+    def test_update_product_invalidates_cache(self):
+        self.get_product()
+
+        self.client.put('/product', json={'id': self.product_id, 'title': 'lamp', 'text': 'lamp text',
+                                          'state': 'used', 'category': 'light'})
+        response = self.get_product()
+
+        self.assertEqual('lamp', response.get_json()['title'])
+        with app.app_context():
+            self.assertIsNone(Product.get_by_title('plug'))
+
+    def test_delete_product_invalidates_cache(self):
+        self.get_product()
+
+        self.client.delete('/product/{0}'.format(self.product_id), headers=self.basic_auth('username'))
+        response = self.get_product()
+
+        self.assertEqual(400, response.status_code)
+
+
+class TestConditionalGet(DatabaseTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.create_user('username')
+        self.product_id = self.create_product('plug')
+        self.headers = self.basic_auth('username')
+
+    def test_product_by_id_not_modified(self):
+        response = self.client.get('/product/{0}'.format(self.product_id), headers=self.headers)
+        etag = response.headers['ETag']
+
+        repeated = self.client.get('/product/{0}'.format(self.product_id),
+                                   headers=dict(self.headers, **{'If-None-Match': etag}))
+
+        self.assertEqual('"product-{0}-1"'.format(self.product_id), etag)
+        self.assertEqual(304, repeated.status_code)
+        self.assertEqual(b'', repeated.data)
+        self.assertEqual(etag, repeated.headers['ETag'])
+
+    def test_product_etag_changes_on_update(self):
+        etag = self.client.get('/product/{0}'.format(self.product_id), headers=self.headers).headers['ETag']
+
+        self.client.put('/product', json={'id': self.product_id, 'title': 'lamp', 'text': 'lamp text',
+                                          'state': 'used', 'category': 'light'})
+        response = self.client.get('/product/{0}'.format(self.product_id),
+                                   headers=dict(self.headers, **{'If-None-Match': etag}))
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('"product-{0}-2"'.format(self.product_id), response.headers['ETag'])
+
+    def test_get_all_products_not_modified(self):
+        etag = self.client.get('/product/all').headers['ETag']
+
+        with self.count_queries() as statements:
+            response = self.client.get('/product/all', headers={'If-None-Match': etag})
+
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(1, len(statements))
+        self.assertIn('table_version', statements[0])
+
+    def test_get_all_products_etag_changes_on_write(self):
+        etag = self.client.get('/product/all').headers['ETag']
+
+        self.create_product('lamp')
+        response = self.client.get('/product/all', headers={'If-None-Match': etag})
+
+        self.assertEqual(200, response.status_code)
+        self.assertNotEqual(etag, response.headers['ETag'])
+        self.assertEqual(2, len(response.get_json()['products']))
+
+    def test_get_all_products_etag_depends_on_query(self):
+        etag = self.client.get('/product/all').headers['ETag']
+
+        response = self.client.get('/product/all?limit=1', headers={'If-None-Match': etag})
+
+        self.assertEqual(200, response.status_code)
+
+    def test_user_by_username_not_modified(self):
+        etag = self.client.get('/user/username', headers=self.headers).headers['ETag']
+
+        response = self.client.get('/user/username', headers=dict(self.headers, **{'If-None-Match': etag}))
+
+        self.assertEqual(304, response.status_code)
+
+
+class TestBulkProducts(DatabaseTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.create_user('admin', roles=('user', 'admin'))
+        self.plug_id = self.create_product('plug')
+        self.lamp_id = self.create_product('lamp')
+
+    def test_bulk_products(self):
+        response = self.client.post('/product/bulk', headers=self.basic_auth('admin'), json=[
+            {'op': 'create', 'title': 'kettle', 'text': 'kettle text', 'state': 'new', 'category': 'kitchen'},
+            {'op': 'update', 'id': self.plug_id, 'title': 'plug', 'text': 'plug text', 'state': 'used',
+             'category': 'electronics'},
+            {'op': 'delete', 'id': self.lamp_id}
+        ])
+
+        results = response.get_json()['results']
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(['created', 'updated', 'deleted'], [result['status'] for result in results])
+        with app.app_context():
+            self.assertEqual(results[0]['id'], Product.get_by_title('kettle').id)
+            self.assertEqual('used', Product.get_by_id(self.plug_id).state)
+            self.assertEqual(2, Product.get_by_id(self.plug_id).version)
+            self.assertIsNone(Product.get_by_title('lamp'))
+
+    def test_bulk_products_runs_in_one_transaction(self):
+        operations = [{'op': 'create', 'title': 'title{0}'.format(i), 'text': 'text{0}'.format(i),
+                       'state': 'new', 'category': 'c'} for i in range(50)]
+
+        with self.count_queries() as statements:
+            response = self.client.post('/product/bulk', headers=self.basic_auth('admin'), json=operations)
+
+        self.assertEqual(50, len([result for result in response.get_json()['results'] if result['id']]))
+        self.assertEqual(1, len([statement for statement in statements
+                                 if statement.startswith('INSERT INTO product ')]))
+        self.assertLessEqual(len([statement for statement in statements if 'FROM user' not in statement and
+                                  'FROM role' not in statement]), 5)
+
+    def test_bulk_products_reports_conflicts(self):
+        response = self.client.post('/product/bulk', headers=self.basic_auth('admin'), json=[
+            {'op': 'create', 'title': 'plug', 'text': 'other', 'state': 'new', 'category': 'c'},
+            {'op': 'create', 'title': 'kettle', 'text': 'kettle text', 'state': 'new', 'category': 'c'},
+            {'op': 'create', 'title': 'toaster', 'text': 'kettle text', 'state': 'new', 'category': 'c'},
+            {'op': 'update', 'id': self.lamp_id, 'title': 'plug', 'text': 'lamp text', 'state': 'new',
+             'category': 'c'}
+        ])
+
+        results = response.get_json()['results']
+        self.assertEqual(['error', 'created', 'error', 'error'], [result['status'] for result in results])
+        self.assertEqual({'message': 'Product name or description is already taken',
+                          'source': "Field 'text' in operation 2."}, results[2]['errors'][0])
+
+    def test_bulk_products_frees_titles_of_deleted_rows(self):
+        response = self.client.post('/product/bulk', headers=self.basic_auth('admin'), json=[
+            {'op': 'delete', 'id': self.plug_id},
+            {'op': 'create', 'title': 'plug', 'text': 'plug text', 'state': 'new', 'category': 'c'}
+        ])
+
+        self.assertEqual(['deleted', 'created'], [result['status'] for result in response.get_json()['results']])
+
+    def test_bulk_products_validates_operations(self):
+        response = self.client.post('/product/bulk', headers=self.basic_auth('admin'), json=[
+            {'op': 'merge'},
+            {'op': 'create', 'title': 'kettle'},
+            {'op': 'update', 'id': 'abc', 'title': 'a', 'text': 'b', 'state': 'c', 'category': 'd'},
+            {'op': 'delete', 'id': 999}
+        ])
+
+        results = response.get_json()['results']
+        self.assertEqual(['error'] * 4, [result['status'] for result in results])
+        self.assertEqual("Field 'text' in operation 1.", results[1]['errors'][0]['source'])
+        self.assertEqual('Product with such id does not exist.', results[3]['errors'][0]['message'])
+
+    def test_bulk_products_with_unicode_digit_id(self):
+        response = self.client.post('/product/bulk', headers=self.basic_auth('admin'), json=[
+            {'op': 'delete', 'id': '\u00b2'},
+            {'op': 'delete', 'id': str(self.plug_id)}
+        ])
+
+        results = response.get_json()['results']
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(['error', 'deleted'], [result['status'] for result in results])
+        self.assertEqual('id should be a number', results[0]['errors'][0]['message'])
+
+    def test_bulk_products_requires_auth(self):
+        response = self.client.post('/product/bulk', json=[{'op': 'delete', 'id': self.plug_id}])
+
+        self.assertEqual(401, response.status_code)
+        with app.app_context():
+            self.assertIsNotNone(db.session.get(Product, self.plug_id))
+
+    def test_bulk_products_with_invalid_body(self):
+        response = self.client.post('/product/bulk', headers=self.basic_auth('admin'), json={'op': 'create'})
+
+        self.assertEqual(400, response.status_code)
+
+    def test_bulk_products_invalidates_cache(self):
+        with app.app_context():
+            Product.get_by_id(self.plug_id)
+
+        self.client.post('/product/bulk', headers=self.basic_auth('admin'), json=[{'op': 'delete', 'id': self.plug_id}])
+
+        with app.app_context():
+            self.assertIsNone(Product.get_by_id(self.plug_id))
+
+
+class TestProductFilters(DatabaseTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.new_lamp = self.create_product('lamp', state='new', category='light')
+        self.used_lamp = self.create_product('old lamp', state='used', category='light')
+        self.create_product('plug', state='new', category='electronics')
+        self.new_bulb = self.create_product('bulb', state='new', category='light')
+
+    def product_ids(self, url):
+        return [product['id'] for product in self.client.get(url).get_json()['products']]
+
+    def test_filter_by_category(self):
+        result = self.product_ids('/product/all?category=light')
+
+        self.assertEqual([self.new_lamp, self.used_lamp, self.new_bulb], result)
+
+    def test_filter_by_category_and_state(self):
+        result = self.product_ids('/product/all?category=light&state=new')
+
+        self.assertEqual([self.new_lamp, self.new_bulb], result)
+
+    def test_filter_with_pagination(self):
+        first = self.client.get('/product/all?category=light&state=new&limit=1').get_json()
+        second = self.product_ids('/product/all?category=light&state=new&limit=1&after_id={0}'
+                                  .format(first['next_after_id']))
+
+        self.assertEqual([self.new_lamp], [product['id'] for product in first['products']])
+        self.assertEqual([self.new_bulb], second)
+
+    def test_filter_export(self):
+        response = self.client.get('/product/export?category=light&state=used&fields=id')
+
+        self.assertEqual('{{"id":{0}}}\n'.format(self.used_lamp).encode(), response.data)
+
+    def test_filter_uses_category_state_index(self):
+        with app.app_context():
+            query = products_query(('id', 'title'), {'category': 'light', 'state': 'new'}, 10).limit(100)
+            statement = str(query.statement.compile(dialect=db.engine.dialect,
+                                                    compile_kwargs={'literal_binds': True}))
+            plan = ' '.join(row[-1] for row in db.session.execute(db.text('EXPLAIN QUERY PLAN ' + statement)))
+
+        self.assertIn('USING INDEX ix_product_category_state (category=? AND state=?', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+class TestProductSearch(DatabaseTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.create_user('admin', roles=('user', 'admin'))
+        self.lamp_id = self.create_product('Red lamp', text='A small desk lamp')
+        self.shade_id = self.create_product('Lamp shade', text='Red fabric shade')
+        self.create_product('Plug', text='European power plug')
+
+    def search(self, url):
+        return self.client.get(url).get_json()
+
+    def test_search_products(self):
+        result = self.search('/product/search?q=red+lamp')
+
+        self.assertEqual(2, result['total'])
+        self.assertEqual([self.lamp_id, self.shade_id], [product['id'] for product in result['products']])
+        self.assertEqual('A small desk lamp', result['products'][0]['text'])
+        self.assertIn('score', result['products'][0])
+
+    def test_search_products_with_pagination(self):
+        result = self.search('/product/search?q=lamp&limit=1')
+
+        self.assertEqual(1, len(result['products']))
+        self.assertEqual(1, result['next_offset'])
+
+    def test_search_follows_writes(self):
+        self.search('/product/search?q=lamp')
+
+        self.client.post('/product', json={'title': 'Kettle', 'text': 'Electric kettle', 'state': 'new',
+                                           'category': 'kitchen'})
+        self.client.put('/product', json={'id': self.lamp_id, 'title': 'Blue lamp', 'text': 'A desk lamp',
+                                          'state': 'new', 'category': 'light'})
+        self.client.post('/product/bulk', headers=self.basic_auth('admin'), json=[{'op': 'delete', 'id': self.shade_id}])
+
+        self.assertEqual(['Kettle'], [product['title'] for product in self.search('/product/search?q=kettle')['products']])
+        self.assertEqual(0, self.search('/product/search?q=red')['total'])
+        self.assertEqual([self.lamp_id], [product['id'] for product in self.search('/product/search?q=lamp')['products']])
+
+    def test_search_reloads_stale_index(self):
+        self.search('/product/search?q=lamp')
+        product_index.loaded_at -= app.config['SEARCH_INDEX_MAX_AGE']
+        self.create_product('Floor lamp')
+
+        result = self.search('/product/search?q=lamp')
+
+        self.assertEqual(3, result['total'])
+
+    def test_search_keeps_index_after_local_writes(self):
+        self.search('/product/search?q=lamp')
+        self.client.post('/product', json={'title': 'Floor lamp', 'text': 'Tall lamp', 'state': 'new',
+                                           'category': 'light'})
+        self.client.post('/product/bulk', headers=self.basic_auth('admin'),
+                         json=[{'op': 'delete', 'id': self.shade_id}])
+        product_index.loaded_at -= app.config['SEARCH_INDEX_MAX_AGE']
+
+        with mock.patch.object(product_index, 'load', wraps=product_index.load) as load:
+            result = self.search('/product/search?q=lamp')
+
+        load.assert_not_called()
+        self.assertEqual(2, result['total'])
+
+    def test_search_follows_single_deletes(self):
+        self.search('/product/search?q=lamp')
+
+        self.client.delete('/product/{0}'.format(self.lamp_id), headers=self.basic_auth('admin'))
+        result = self.search('/product/search?q=lamp&limit=1')
+
+        self.assertEqual(1, result['total'])
+        self.assertEqual([self.shade_id], [product['id'] for product in result['products']])
+        self.assertIsNone(result['next_offset'])
+
+    def test_search_ignores_after_id(self):
+        response = self.client.get('/product/search?q=lamp&after_id=abc')
+
+        self.assertEqual(200, response.status_code)
+
+    def test_search_with_blank_query(self):
+        response = self.client.get('/product/search?q=')
+
+        self.assertEqual(400, response.status_code)
+
+    def test_search_with_unicode_digit_offset(self):
+        response = self.client.get('/product/search?q=lamp&offset=%C2%B2')
+
+        self.assertEqual(400, response.status_code)
+        self.assertEqual("Field 'offset' in query parameters.", response.json['errors'][0]['source'])
+
+
+class TestRequestInstrumentation(DatabaseTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        request_metrics.reset()
+        self.create_user('username')
+
+    def test_server_timing_header(self):
+        response = self.client.get('/user/username', headers=self.basic_auth('username'))
+
+        timing = response.headers['Server-Timing']
+        self.assertTrue(timing.startswith('db;dur='))
+        self.assertIn('desc="1 queries"', timing)
+        self.assertIn('auth;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+    def test_metrics_endpoint(self):
+        self.client.get('/product/all')
+        self.client.get('/user/username', headers=self.basic_auth('username'))
+
+        response = self.client.get('/metrics')
+
+        body = response.get_data(as_text=True)
+        self.assertEqual('text/plain', response.mimetype)
+        self.assertIn('http_request_duration_seconds_count{route="/product/all",method="GET"} 1', body)
+        self.assertIn('http_request_sql_queries_total{route="/user/<string:username>",method="GET"} 1', body)
+        self.assertIn('phase="auth"', body)
+        self.assertIn('credential_cache_misses', body)
+
+    def test_metrics_disabled(self):
+        app.config['METRICS_ENABLED'] = False
+        try:
+            response = self.client.get('/product/all')
+            metrics_response = self.client.get('/metrics')
+        finally:
+            app.config['METRICS_ENABLED'] = True
+
+        self.assertNotIn('Server-Timing', response.headers)
+        self.assertEqual(404, metrics_response.status_code)
+
+
+class TestQueryLog(DatabaseTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.create_user('username')
+        for i in range(5):
+            self.create_product('plug{0}'.format(i))
+
+    def test_product_listing_query_budget(self):
+        with self.query_budget(max_queries=2, max_repeated=1):
+            response = self.client.get('/product/all?limit=5')
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(5, len(response.json['products']))
+
+    def test_user_lookup_query_budget(self):
+        with self.query_budget(max_queries=1, max_repeated=1):
+            response = self.client.get('/user/username', headers=self.basic_auth('username'))
+
+        self.assertEqual(200, response.status_code)
+
+    def test_slow_query_is_logged_with_route(self):
+        with mock.patch.object(slow_query_log, 'threshold', 0), \
+                self.assertLogs('src.metrics.query_log', level='WARNING') as logs:
+            self.client.get('/product/all?limit=5')
+
+        self.assertTrue(all('on /product/all: SELECT' in line for line in logs.output))
+        self.assertIn('parameters:', logs.output[0])
+
+    def test_repeated_statements_are_flagged(self):
+        with mock.patch.object(repeated_query_detector, 'threshold', 0), \
+                self.assertLogs('src.metrics.query_log', level='WARNING') as logs:
+            self.client.get('/product/all?limit=5')
+
+        self.assertIn('Possible N+1 on /product/all: 1 identical statements', logs.output[0])
+
+    def test_distinct_statements_are_not_flagged(self):
+        with self.assertNoLogs('src.metrics.query_log', level='WARNING'):
+            self.client.get('/product/1', headers=self.basic_auth('username'))
+
+
+class TestRequestValidation(DatabaseTestCase):
+
+    def test_product_missing_field(self):
+        response = self.client.post('/product', json={'title': 'lamp', 'text': 'lamp text', 'state': 'new'})
+
+        self.assertEqual(400, response.status_code)
+        self.assertEqual([{'message': 'category cannot be blank', 'source': 'Field \'category\' in the request body.'}],
+                         response.json['errors'])
+
+    def test_update_product_invalid_id(self):
+        response = self.client.put('/product', json={'id': 'lamp', 'title': 'lamp', 'text': 'lamp text',
+                                                     'state': 'new', 'category': 'light'})
+
+        self.assertEqual(400, response.status_code)
+        self.assertEqual('id should be a number', response.json['errors'][0]['message'])
+
+    def test_product_fields_from_query_string(self):
+        response = self.client.post('/product?title=lamp&text=lamp%20text&state=new&category=light')
+        with app.app_context():
+            product_id = Product.query.filter_by(title='lamp').one().id
+        update = self.client.put('/product?id={0}&title=lamp&text=lamp%20text&state=used&category=light'
+                                 .format(product_id))
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(200, update.status_code)
+        with app.app_context():
+            self.assertEqual('used', db.session.get(Product, product_id).state)
+
+    def test_create_user_missing_field(self):
+        response = self.client.post('/user', json={'username': 'username', 'firstname': 'firstname',
+                                                   'lastname': 'lastname', 'password': 'password'})
+
+        self.assertEqual(400, response.status_code)
+        self.assertEqual('email cannot be blank', response.json['errors'][0]['message'])
+
+    def test_create_user(self):
+        response = self.client.post('/user', json={'username': 'username', 'firstname': 'firstname',
+                                                   'lastname': 'lastname', 'email': 'username@mail.com',
+                                                   'password': 'password'})
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(200, self.client.get('/user/username', headers=self.basic_auth('username')).status_code)
+
+    def test_create_user_issues_single_insert_transaction(self):
+        with self.count_queries() as statements:
+            self.client.post('/user', json={'username': 'username', 'firstname': 'firstname',
+                                            'lastname': 'lastname', 'email': 'username@mail.com',
+                                            'password': 'password'})
+
+        self.assertFalse([statement for statement in statements if statement.startswith('SELECT') and
+                          'FROM user' in statement])
+        self.assertEqual(['INSERT INTO user', 'INSERT INTO users_roles'],
+                         [statement.split(' (')[0] for statement in statements
+                          if statement.startswith('INSERT')])
+
+    def test_create_user_duplicate_username(self):
+        self.create_user('username')
+
+        with mock.patch('src.main.User.create_hash', wraps=User.create_hash) as create_hash:
+            response = self.client.post('/user', json={'username': 'username', 'firstname': 'firstname',
+                                                       'lastname': 'lastname', 'email': 'other@mail.com',
+                                                       'password': 'password'})
+
+        self.assertEqual(400, response.status_code)
+        self.assertEqual([{'message': 'User with such username already exists.',
+                           'source': "Field 'username' in the request body."}], response.json['errors'])
+        create_hash.assert_called_once()
+
+    def test_create_user_duplicate_email(self):
+        self.create_user('username')
+
+        response = self.client.post('/user', json={'username': 'other', 'firstname': 'firstname',
+                                                   'lastname': 'lastname', 'email': 'username@mail.com',
+                                                   'password': 'password'})
+
+        self.assertEqual(400, response.status_code)
+        self.assertEqual([{'message': 'User with such email already exists.',
+                           'source': "Field 'email' in the request body."}], response.json['errors'])
+        with app.app_context():
+            self.assertEqual(1, User.query.count())
+
+    def test_create_user_invalid_password_skips_hashing(self):
+        with mock.patch('src.main.User.create_hash') as create_hash:
+            response = self.client.post('/user', json={'username': 'username', 'firstname': 'firstname',
+                                                       'lastname': 'lastname', 'email': 'username@mail.com',
+                                                       'password': 'pass'})
+
+        self.assertEqual(400, response.status_code)
+        create_hash.assert_not_called()
+
+
+class TestPasswordHashing(DatabaseTestCase):
+
+    def test_login_rehashes_outdated_hash(self):
+        user_id = self.create_user('username')
+        with app.app_context():
+            user = db.session.get(User, user_id)
+            user.password = crypt_context(1000).hash('password')
+            user.save_db()
+
+        response = self.client.get('/user/username', headers=self.basic_auth('username'))
+
+        self.assertEqual(200, response.status_code)
+        with app.app_context():
+            password_hash = db.session.get(User, user_id).password
+        self.assertFalse(password_hasher.needs_update(password_hash))
+        self.assertTrue(User.check_hash('password', password_hash))
+
+    def test_saturated_pool_on_signup(self):
+        with mock.patch.object(password_hasher, '_run', side_effect=HashingPoolSaturated(retry_after=1)):
+            response = self.client.post('/user', json={'username': 'username', 'firstname': 'firstname',
+                                                       'lastname': 'lastname', 'email': 'username@mail.com',
+                                                       'password': 'password'})
+
+        self.assertEqual(503, response.status_code)
+        self.assertEqual('1', response.headers['Retry-After'])
+        self.assertEqual('Password hashing.', response.json['errors'][0]['source'])
+
+    def test_saturated_pool_on_basic_auth(self):
+        self.create_user('username')
+
+        with mock.patch.object(password_hasher, '_run', side_effect=HashingPoolSaturated(retry_after=1)):
+            response = self.client.get('/product/1', headers=self.basic_auth('username'))
+
+        self.assertEqual(503, response.status_code)
+        self.assertEqual('1', response.headers['Retry-After'])
+
+
+class TestRoleRegistry(DatabaseTestCase):
+
+    def signup(self, username):
+        return self.client.post('/user', json={'username': username, 'firstname': 'firstname',
+                                               'lastname': 'lastname', 'email': username + '@mail.com',
+                                               'password': 'password'})
+
+    def test_signup_reads_roles_from_registry(self):
+        self.signup('first')
+
+        with self.count_queries() as statements:
+            response = self.signup('second')
+
+        self.assertEqual(200, response.status_code)
+        self.assertFalse([statement for statement in statements if 'FROM role' in statement])
+        with app.app_context():
+            self.assertEqual(['user'], [role.name for role in User.get_by_username('second').roles])
+
+    def test_save_to_db_reloads_registry(self):
+        self.signup('first')
+        with app.app_context():
+            Role(name='owner').save_to_db()
+
+        self.assertFalse(role_registry.loaded)
+        self.signup('second')
+        self.assertIsNotNone(role_registry.id('owner'))
+
+    def test_version_change_reloads_after_max_age(self):
+        self.signup('first')
+        with app.app_context():
+            db.session.add(Role(name='owner'))
+            TableVersion.bump('role')
+            db.session.commit()
+
+        self.signup('second')
+        self.assertIsNone(role_registry.id('owner'))
+
+        role_registry.loaded_at -= app.config['ROLE_REGISTRY_MAX_AGE']
+        self.signup('third')
+        self.assertIsNotNone(role_registry.id('owner'))
+
+    def test_admin_membership(self):
+        self.create_user('admin', roles=('user', 'admin'))
+        product_id = self.create_product('plug')
+
+        response = self.client.delete('/product/{0}'.format(product_id), headers=self.basic_auth('admin'))
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(2, role_registry.id('admin'))
+
+
+class TestAdmission(DatabaseTestCase):
+
+    def signup(self, username):
+        return self.client.post('/user', json={'username': username, 'firstname': 'firstname',
+                                               'lastname': 'lastname', 'email': username + '@mail.com',
+                                               'password': 'password'})
+
+    def test_signup_burst_is_rate_limited(self):
+        with mock.patch.dict(rate_limiter.limits, {'hashing': (0.5, 2)}):
+            statuses = [self.signup('user{0}'.format(i)).status_code for i in range(2)]
+            response = self.signup('user2')
+
+        self.assertEqual([200, 200], statuses)
+        self.assertEqual(429, response.status_code)
+        self.assertEqual('2', response.headers['Retry-After'])
+        self.assertEqual('Rate limit.', response.json['errors'][0]['source'])
+
+    def test_cached_credentials_are_not_hashing_requests(self):
+        self.create_user('username')
+
+        with mock.patch.dict(rate_limiter.limits, {'hashing': (0.5, 1)}):
+            self.assertEqual(200, self.client.get('/user/username', headers=self.basic_auth('username')).status_code)
+            self.assertEqual(429, self.signup('other').status_code)
+            responses = [self.client.get('/user/username', headers=self.basic_auth('username')) for _ in range(3)]
+            wrong_password = self.client.get('/user/username', headers=self.basic_auth('username', 'wrong'))
+
+        self.assertEqual([200, 200, 200], [response.status_code for response in responses])
+        self.assertEqual(429, wrong_password.status_code)
+
+    def test_credential_cache_is_checked_once_per_request(self):
+        self.create_user('username')
+
+        self.client.get('/user/username', headers=self.basic_auth('username'))
+        self.client.get('/user/username', headers=self.basic_auth('username'))
+
+        self.assertEqual((1, 1), (credential_cache.stats()['hits'], credential_cache.stats()['misses']))
+
+    def test_cheap_routes_are_not_limited_by_default(self):
+        self.create_product('plug')
+
+        responses = [self.client.get('/product/all') for _ in range(150)]
+
+        self.assertEqual({200}, {response.status_code for response in responses})
+
+    def test_hashing_concurrency_cap(self):
+        self.create_product('plug')
+
+        with mock.patch.object(hashing_admission, 'limit', 1), mock.patch.object(hashing_admission, 'in_flight', 1):
+            signup = self.signup('username')
+            cheap = self.client.get('/product/all')
+
+        self.assertEqual(503, signup.status_code)
+        self.assertEqual('1', signup.headers['Retry-After'])
+        self.assertEqual(200, cheap.status_code)
+
+    def test_admission_slot_is_released(self):
+        self.signup('username')
+        self.client.get('/user/username', headers=self.basic_auth('username', 'wrong'))
+
+        self.assertEqual(0, hashing_admission.in_flight)
+
+    def test_admission_is_timed(self):
+        response = self.client.get('/')
+
+        self.assertIn('admission;dur=', response.headers['Server-Timing'])
+
+
+class TestProductChanges(DatabaseTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.create_user('admin', roles=('user', 'admin'))
+
+    def changes(self, since=0, **args):
+        return self.client.get('/product/changes', query_string=dict(args, since=since))
+
+    def test_feed_covers_inserts_updates_and_tombstones(self):
+        self.client.post('/product', json={'title': 'plug', 'text': 'goody', 'state': 'new', 'category': 'power'})
+        self.client.post('/product', json={'title': 'lamp', 'text': 'light', 'state': 'new', 'category': 'light'})
+        plug_id, lamp_id = [change['id'] for change in self.changes().json['changes']]
+        cursor = self.changes().json['next_since']
+
+        self.client.put('/product', json={'id': plug_id, 'title': 'plug', 'text': 'goody', 'state': 'used',
+                                          'category': 'power'})
+        self.client.delete('/product/{0}'.format(lamp_id), headers=self.basic_auth('admin'))
+        response = self.changes(cursor)
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual([('update', plug_id, 'used'), ('delete', lamp_id, None)],
+                         [(change['op'], change['id'], change['product'] and change['product']['state'])
+                          for change in response.json['changes']])
+        self.assertEqual(cursor + 2, response.json['next_since'])
+        self.assertFalse(response.json['has_more'])
+
+    def test_changes_are_compacted_per_product(self):
+        product_id = self.create_product('plug')
+        with app.app_context():
+            product = db.session.get(Product, product_id)
+            product.state = 'used'
+            product.save_db()
+
+        changes = self.changes().json['changes']
+
+        self.assertEqual([('update', product_id)], [(change['op'], change['id']) for change in changes])
+        self.assertEqual({'id': product_id, 'title': 'plug', 'text': 'plug text', 'state': 'used',
+                          'category': 'electronics'}, changes[0]['product'])
+
+    def test_caught_up_cursor(self):
+        self.create_product('plug')
+        cursor = self.changes().json['next_since']
+
+        response = self.changes(cursor)
+
+        self.assertEqual({'changes': [], 'next_since': cursor, 'has_more': False}, response.json)
+
+    def test_paging(self):
+        product_ids = [self.create_product('product{0}'.format(i)) for i in range(3)]
+
+        first = self.changes(limit=2).json
+        second = self.changes(first['next_since'], limit=2).json
+
+        self.assertTrue(first['has_more'])
+        self.assertFalse(second['has_more'])
+        self.assertEqual(product_ids, [change['id'] for change in first['changes'] + second['changes']])
+
+    def test_bulk_operations_are_recorded(self):
+        product_ids = [self.create_product('product{0}'.format(i)) for i in range(2)]
+        cursor = self.changes().json['next_since']
+
+        results = self.client.post('/product/bulk', headers=self.basic_auth('admin'), json=[
+            {'op': 'delete', 'id': product_ids[0]},
+            {'op': 'update', 'id': product_ids[1], 'title': 'lamp', 'text': 'light', 'state': 'used', 'category': 'c'},
+            {'op': 'create', 'title': 'plug', 'text': 'goody', 'state': 'new', 'category': 'c'}
+        ]).json['results']
+
+        self.assertEqual([('delete', product_ids[0]), ('update', product_ids[1]), ('insert', results[2]['id'])],
+                         [(change['op'], change['id']) for change in self.changes(cursor).json['changes']])
+
+    def test_rolled_back_write_is_not_recorded(self):
+        product_id = self.create_product('plug')
+        self.create_product('lamp')
+        cursor = self.changes().json['next_since']
+
+        response = self.client.put('/product', json={'id': product_id, 'title': 'lamp', 'text': 'light',
+                                                     'state': 'new', 'category': 'c'})
+
+        self.assertEqual(500, response.status_code)
+        self.assertEqual([], self.changes(cursor).json['changes'])
+        with app.app_context():
+            self.assertEqual(2, ProductChange.query.count())
+
+    def test_invalid_cursor(self):
+        response = self.changes('latest')
+
+        self.assertEqual(400, response.status_code)
+        self.assertEqual("Field 'since' in query parameters.", response.json['errors'][0]['source'])
+
+    def test_unicode_digit_cursor(self):
+        response = self.changes('\u00b2')
+
+        self.assertEqual(400, response.status_code)
+        self.assertEqual("Field 'since' in query parameters.", response.json['errors'][0]['source'])
+
+
+class TestCompression(DatabaseTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        with app.app_context():
+            db.session.execute(Product.__table__.insert(), [
+                {'title': 'title{0}'.format(i), 'text': 'text{0}'.format(i), 'state': 'new', 'category': 'category'}
+                for i in range(50)
+            ])
+            db.session.commit()
+
+    def test_product_list_is_compressed(self):
+        plain = self.client.get('/product/all')
+        response = self.client.get('/product/all', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual('gzip', response.headers['Content-Encoding'])
+        self.assertEqual(plain.data, gzip.decompress(response.data))
+        self.assertLess(len(response.data), len(plain.data))
+        self.assertIn('Accept-Encoding', response.vary)
+        self.assertEqual('*', response.headers['Access-Control-Allow-Origin'])
+
+    def test_small_responses_are_not_compressed(self):
+        response = self.client.get('/product/all?limit=1', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertIn('Accept-Encoding', response.vary)
+
+    def test_export_is_compressed_while_streaming(self):
+        plain = self.client.get('/product/export').data
+        response = self.client.get('/product/export', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual('gzip', response.headers['Content-Encoding'])
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(plain, gzip.decompress(b''.join(response.response)))
+
+    def test_compressed_etag_still_matches(self):
+        response = self.client.get('/product/all', headers={'Accept-Encoding': 'gzip'})
+        etag = response.headers['ETag']
+
+        self.assertTrue(etag.startswith('W/'))
+        cached = self.client.get('/product/all', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+        self.assertEqual(304, cached.status_code)
+
+
+class TestReadReplica(DatabaseTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        replica = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'replica.db')
+        with app.app_context():
+            self.replica = db.engines['replica_0'] = create_engine(replica)
+            db.metadata.create_all(self.replica)
+        self.product_id = self.create_product('plug')
+
+    def tearDown(self) -> None:
+        with app.app_context():
+            db.engines.pop('replica_0').dispose()
+        super().tearDown()
+
+    def product_titles(self):
+        return [product['title'] for product in self.client.get('/product/all').json['products']]
+
+    def test_reads_go_to_replica(self):
+        with self.replica.begin() as connection:
+            connection.execute(Product.__table__.insert(), {'title': 'replica', 'text': 'replica', 'state': 'new',
+                                                            'category': 'electronics'})
+
+        self.assertEqual(['replica'], self.product_titles())
+
+    def test_writes_go_to_primary(self):
+        response = self.client.post('/product', json={'title': 'lamp', 'text': 'lamp text', 'state': 'new',
+                                                      'category': 'light'})
+
+        self.assertEqual(200, response.status_code)
+        with app.app_context():
+            self.assertEqual(['plug', 'lamp'], [product.title for product in Product.query.order_by(Product.id)])
+        with self.replica.connect() as connection:
+            self.assertEqual([], connection.execute(Product.__table__.select()).all())
+
+    def test_read_your_writes(self):
+        self.client.post('/product', json={'title': 'lamp', 'text': 'lamp text', 'state': 'new', 'category': 'light'})
+
+        self.assertEqual(['plug', 'lamp'], self.product_titles())
+
+        read_your_writes.clear()
+        self.assertEqual([], self.product_titles())
+
+    def test_replica_reads_do_not_fill_product_cache(self):
+        with self.replica.begin() as connection:
+            connection.execute(Product.__table__.insert(), {'id': self.product_id, 'title': 'stale', 'text': 'stale',
+                                                            'state': 'new', 'category': 'electronics'})
+
+        with app.test_request_context():
+            db.session.info['read_only'] = True
+            self.assertEqual('stale', Product.get_by_id(self.product_id).title)
+            self.assertEqual('stale', Product.get_by_title('stale').title)
+
+        self.assertIsNone(product_cache.get(self.product_id))
+        with app.app_context():
+            self.assertEqual('plug', Product.get_by_id(self.product_id).title)
+        self.assertEqual('plug', product_cache.get(self.product_id)['title'])
+
+    def test_failed_writes_do_not_pin_reads(self):
+        self.client.post('/product', json={'title': 'lamp'})
+
+        self.assertEqual([], self.product_titles())
+
+
+class TestSingleStatementWrites(DatabaseTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.create_user('admin', roles=('user', 'admin'))
+        self.product_id = self.create_product('plug', text='goody')
+
+    def product_body(self, **fields):
+        body = {'id': self.product_id, 'title': 'lamp', 'text': 'lamp text', 'state': 'used', 'category': 'light'}
+        body.update(fields)
+        return body
+
+    def test_update_product(self):
+        with app.app_context():
+            version = TableVersion.get('product')
+
+        with self.count_queries() as statements:
+            response = self.client.put('/product', json=self.product_body())
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(1, len([statement for statement in statements if 'FROM product' in statement or
+                                 statement.startswith('UPDATE product ')]))
+        with app.app_context():
+            product = db.session.get(Product, self.product_id)
+            self.assertEqual(('lamp', 'used', 2), (product.title, product.state, product.version))
+            self.assertEqual(version + 1, TableVersion.get('product'))
+
+    def test_update_missing_product(self):
+        response = self.client.put('/product', json=self.product_body(id=self.product_id + 1))
+
+        self.assertEqual(404, response.status_code)
+        self.assertEqual('Product with such id does not exist.', response.json['errors'][0]['message'])
+
+    def test_update_product_conflict(self):
+        self.create_product('lamp')
+
+        response = self.client.put('/product', json=self.product_body())
+
+        self.assertEqual(500, response.status_code)
+        self.assertEqual({'message': 'Product name or description is already taken'}, response.json)
+
+    def test_update_invalidates_etag(self):
+        etag = self.client.get('/product/{0}'.format(self.product_id), headers=self.basic_auth('admin')).headers['ETag']
+        self.client.put('/product', json=self.product_body())
+
+        response = self.client.get('/product/{0}'.format(self.product_id),
+                                   headers=dict(self.basic_auth('admin'), **{'If-None-Match': etag}))
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('lamp', response.json['title'])
+
+    def test_delete_product(self):
+        with app.app_context():
+            version = TableVersion.get('product')
+
+        with self.count_queries() as statements:
+            result = self.client.delete('/product/{0}'.format(self.product_id), headers=self.basic_auth('admin'))
+
+        self.assertEqual({'id': self.product_id, 'title': 'plug', 'text': 'goody', 'state': 'new',
+                          'category': 'electronics'}, result.json)
+        self.assertEqual(1, len([statement for statement in statements
+                                 if statement.startswith('DELETE FROM product ')]))
+        with app.app_context():
+            self.assertIsNone(db.session.get(Product, self.product_id))
+            self.assertEqual(version + 1, TableVersion.get('product'))
+
+    def test_delete_cached_product_skips_select(self):
+        self.client.get('/product/{0}'.format(self.product_id), headers=self.basic_auth('admin'))
+
+        with self.count_queries() as statements:
+            self.client.delete('/product/{0}'.format(self.product_id), headers=self.basic_auth('admin'))
+
+        self.assertFalse([statement for statement in statements if statement.startswith('SELECT') and 'product.' in statement])
+        self.assertIsNone(product_cache.get(self.product_id))
+
+    def test_delete_missing_product(self):
+        response = self.client.delete('/product/{0}'.format(self.product_id + 1), headers=self.basic_auth('admin'))
+
+        self.assertEqual(404, response.status_code)
+
+    def test_delete_user(self):
+        user_id = self.create_user('username')
+
+        response = self.client.delete('/user/{0}'.format(user_id), headers=self.basic_auth('admin'))
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('username', response.json['username'])
+        self.assertEqual(['user'], response.json['roles'])
+        self.assertNotIn('version', response.json)
+        with app.app_context():
+            self.assertIsNone(db.session.get(User, user_id))
+
+    def test_delete_missing_user(self):
+        response = self.client.delete('/user/999', headers=self.basic_auth('admin'))
+
+        self.assertEqual(404, response.status_code)
+        self.assertEqual('User with such id does not exist.', response.json['errors'][0]['message'])
@@ -0,0 +1,55 @@
+from unittest import TestCase
+
+from src.auth.password_hasher import PasswordHasher, HashingPoolSaturated, crypt_context
+
+
+class TestPasswordHasher(TestCase):
+
+    def test_inline(self):
+        hasher = PasswordHasher(rounds=1000)
+        password_hash = hasher.hash('password')
+
+        self.assertTrue(password_hash.startswith('$pbkdf2-sha256$1000$'))
+        self.assertTrue(hasher.verify('password', password_hash))
+        self.assertFalse(hasher.verify('wrong', password_hash))
+
+    def test_pool(self):
+        hasher = PasswordHasher(rounds=1000, workers=1, queue_size=1)
+        try:
+            password_hash = hasher.hash('password')
+
+            self.assertTrue(hasher.verify('password', password_hash))
+            self.assertEqual({'workers': 1, 'queue_size': 1, 'in_flight': 0, 'rejected': 0}, hasher.stats())
+        finally:
+            hasher.shutdown()
+
+    def test_start_spawns_workers(self):
+        hasher = PasswordHasher(rounds=1000, workers=2)
+        try:
+            hasher.start()
+
+            self.assertEqual(2, len(hasher._executor._processes))
+            self.assertEqual(0, hasher.stats()['in_flight'])
+        finally:
+            hasher.shutdown()
+
+        self.assertIsNone(hasher._executor)
+
+    def test_saturated(self):
+        hasher = PasswordHasher(rounds=1000, workers=1, queue_size=0, retry_after=2)
+        hasher._slots.acquire()
+
+        with self.assertRaises(HashingPoolSaturated) as raised:
+            hasher.hash('password')
+
+        self.assertEqual(503, raised.exception.code)
+        self.assertEqual(2, raised.exception.retry_after)
+        self.assertEqual(1, hasher.stats()['rejected'])
+        hasher.shutdown()
+
+    def test_needs_update(self):
+        hasher = PasswordHasher(rounds=2000)
+
+        self.assertTrue(hasher.needs_update(crypt_context(1000).hash('password')))
+        self.assertFalse(hasher.needs_update(crypt_context(2000).hash('password')))
+        self.assertFalse(hasher.needs_update('not a hash'))
@@ -0,0 +1,100 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import TestCase
+
+from sqlalchemy import create_engine, exc, text
+
+from src.database.pool import InstrumentedQueuePool, PoolMetrics, engine_options
+
+
+class TestEngineOptions(TestCase):
+
+    def test_in_memory_sqlite_keeps_default_pool(self):
+        self.assertEqual({}, engine_options('sqlite://', {}))
+
+    def test_defaults(self):
+        result = engine_options('mysql+pymysql://root@localhost/shop', {})
+
+        self.assertEqual({'poolclass': InstrumentedQueuePool, 'pool_size': 10, 'max_overflow': 10,
+                          'pool_recycle': 280, 'pool_pre_ping': True, 'pool_timeout': 10.0}, result)
+
+    def test_environment_overrides(self):
+        result = engine_options('mysql+pymysql://root@localhost/shop', {
+            'DB_POOL_SIZE': '4', 'DB_MAX_OVERFLOW': '2', 'DB_POOL_RECYCLE': '60',
+            'DB_POOL_PRE_PING': 'false', 'DB_POOL_TIMEOUT': '0.5'})
+
+        self.assertEqual(4, result['pool_size'])
+        self.assertEqual(2, result['max_overflow'])
+        self.assertEqual(60, result['pool_recycle'])
+        self.assertFalse(result['pool_pre_ping'])
+        self.assertEqual(0.5, result['pool_timeout'])
+
+    def test_sqlite_file_allows_cross_thread_connections(self):
+        result = engine_options('sqlite:////tmp/shop.db', {})
+
+        self.assertEqual({'check_same_thread': False}, result['connect_args'])
+
+
+class TestInstrumentedQueuePool(TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        self.metrics = PoolMetrics()
+        self.pool_class = type('TestPool', (InstrumentedQueuePool,), {'metrics': self.metrics})
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.directory)
+
+    def create_engine(self, **environ):
+        url = 'sqlite:///' + os.path.join(self.directory, 'shop.db')
+        options = engine_options(url, environ)
+        options['poolclass'] = self.pool_class
+        return create_engine(url, **options)
+
+    def test_threads_wait_for_checkout(self):
+        engine = self.create_engine(DB_POOL_SIZE='1', DB_MAX_OVERFLOW='0')
+
+        def worker():
+            with engine.connect() as connection:
+                connection.execute(text('SELECT 1'))
+                time.sleep(0.05)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        result = self.metrics.snapshot()
+        self.assertEqual(4, result['checkouts'])
+        self.assertGreaterEqual(result['checkout_wait_seconds_max'], 0.04)
+        self.assertGreaterEqual(result['checkout_wait_seconds_total'], 0.1)
+        self.assertEqual(0, result['checked_out'])
+        self.assertEqual(1, result['pool_size'])
+        engine.dispose()
+
+    def test_checked_out_and_overflow(self):
+        engine = self.create_engine(DB_POOL_SIZE='1', DB_MAX_OVERFLOW='1')
+
+        first = engine.connect()
+        second = engine.connect()
+        result = self.metrics.snapshot()
+        first.close()
+        second.close()
+
+        self.assertEqual(2, result['checked_out'])
+        self.assertEqual(1, result['overflow'])
+        engine.dispose()
+
+    def test_checkout_timeout(self):
+        engine = self.create_engine(DB_POOL_SIZE='1', DB_MAX_OVERFLOW='0', DB_POOL_TIMEOUT='0.05')
+
+        with engine.connect():
+            with self.assertRaises(exc.TimeoutError):
+                engine.connect()
+
+        self.assertEqual(1, self.metrics.snapshot()['checkout_timeouts'])
+        engine.dispose()
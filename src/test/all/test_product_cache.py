@@ -0,0 +1,89 @@
+from unittest import TestCase
+from src.cache.lru import LRUCache
+from src.cache.product_cache import ProductCache, SharedCacheBackend, LocalSharedClient, build_cache_backend
+
+
+class TestLocalSharedClient(TestCase):
+
+    def setUp(self) -> None:
+        self.now = 0.0
+        self.client = LocalSharedClient(max_size=2, clock=lambda: self.now)
+
+    def test_set_with_expiry(self):
+        self.client.set('a', '1', ex=10)
+
+        self.assertEqual('1', self.client.get('a'))
+        self.now = 11
+        self.assertIsNone(self.client.get('a'))
+
+    def test_oldest_key_is_evicted(self):
+        self.client.set('a', '1')
+        self.client.set('b', '2')
+        self.client.set('c', '3')
+
+        self.assertIsNone(self.client.get('a'))
+        self.assertEqual(1, self.client.evictions)
+        self.assertEqual(2, self.client.dbsize())
+
+
+class TestSharedCacheBackend(TestCase):
+
+    def setUp(self) -> None:
+        self.backend = SharedCacheBackend(LocalSharedClient(), ttl=60)
+
+    def test_values_round_trip_as_json(self):
+        self.backend.set('key', {'id': 1})
+
+        self.assertEqual({'id': 1}, self.backend.get('key'))
+        self.assertIsNone(self.backend.get('missing'))
+        self.assertEqual({'hits': 1, 'misses': 1, 'evictions': 0, 'size': 1, 'hit_ratio': 0.5},
+                         self.backend.stats())
+
+    def test_delete(self):
+        self.backend.set('key', 1)
+
+        self.assertTrue(self.backend.delete('key'))
+        self.assertIsNone(self.backend.get('key'))
+
+
+class TestBuildCacheBackend(TestCase):
+
+    def test_local(self):
+        self.assertIsInstance(build_cache_backend('local', 10, 60), LRUCache)
+
+    def test_shared(self):
+        self.assertIsInstance(build_cache_backend('shared', 10, 60), SharedCacheBackend)
+
+    def test_unknown(self):
+        with self.assertRaises(ValueError):
+            build_cache_backend('memcached', 10, 60)
+
+
+class TestProductCache(TestCase):
+
+    def setUp(self) -> None:
+        self.product_json = {'id': 1, 'title': 'plug', 'text': 'goody', 'state': 'new', 'category': 'electronics'}
+        self.caches = [ProductCache(LRUCache()), ProductCache(SharedCacheBackend(LocalSharedClient()))]
+
+    def test_get(self):
+        for cache in self.caches:
+            cache.set(self.product_json)
+
+            self.assertEqual(self.product_json, cache.get(1))
+            self.assertEqual(self.product_json, cache.get_by_title('plug'))
+
+    def test_invalidate(self):
+        for cache in self.caches:
+            cache.set(self.product_json)
+            cache.invalidate(1)
+
+            self.assertIsNone(cache.get(1))
+            self.assertIsNone(cache.get_by_title('plug'))
+
+    def test_stale_title_is_ignored(self):
+        for cache in self.caches:
+            cache.set(self.product_json)
+            cache.set(dict(self.product_json, title='lamp'))
+
+            self.assertIsNone(cache.get_by_title('plug'))
+            self.assertEqual('lamp', cache.get_by_title('lamp')['title'])
@@ -0,0 +1,105 @@
+from collections import Counter
+from unittest import TestCase
+
+from sqlalchemy import create_engine, text
+
+from src.metrics.query_log import normalize, SlowQueryLog, RepeatedQueryDetector, QueryBudgetExceeded, query_budget
+
+
+class TestNormalize(TestCase):
+
+    def test_literals_and_whitespace(self):
+        self.assertEqual('SELECT * FROM product WHERE id = ? AND title = ?',
+                         normalize("SELECT *\n  FROM product WHERE id = 12 AND title = 'it''s'"))
+
+    def test_in_lists_collapse(self):
+        self.assertEqual(normalize('SELECT * FROM product WHERE id IN (?, ?, ?)'),
+                         normalize('SELECT * FROM product WHERE id IN (?)'))
+        self.assertEqual(normalize('SELECT * FROM product WHERE id IN (%(id_1)s, %(id_2)s)'),
+                         normalize('SELECT * FROM product WHERE id IN (%(id_1)s)'))
+
+    def test_identifiers_with_digits_are_kept(self):
+        self.assertEqual('SELECT product_1.id FROM product AS product_1',
+                         normalize('SELECT product_1.id FROM product AS product_1'))
+
+
+class TestSlowQueryLog(TestCase):
+
+    def test_fast_queries_are_ignored(self):
+        log = SlowQueryLog(threshold_ms=100)
+        with self.assertNoLogs('src.metrics.query_log', level='WARNING'):
+            self.assertFalse(log.record('SELECT 1', (), 0.05, '/product/all'))
+
+    def test_slow_queries_are_logged(self):
+        log = SlowQueryLog(threshold_ms=100)
+        with self.assertLogs('src.metrics.query_log', level='WARNING') as logs:
+            self.assertTrue(log.record('SELECT *\nFROM product WHERE id = ?', (7,), 0.25, '/product/<id>'))
+
+        self.assertIn('250.0 ms', logs.output[0])
+        self.assertIn('/product/<id>', logs.output[0])
+        self.assertIn('SELECT * FROM product WHERE id = ?', logs.output[0])
+        self.assertIn('(7,)', logs.output[0])
+
+    def test_parameters_are_truncated(self):
+        log = SlowQueryLog(threshold_ms=0, max_parameters_length=10)
+        with self.assertLogs('src.metrics.query_log', level='WARNING') as logs:
+            log.record('INSERT', [{'title': 'x' * 100}], 1.0)
+
+        self.assertNotIn('x' * 20, logs.output[0])
+
+
+class TestRepeatedQueryDetector(TestCase):
+
+    def test_check(self):
+        detector = RepeatedQueryDetector(threshold=2)
+        shapes = Counter({'SELECT role': 3, 'SELECT user': 2})
+        with self.assertLogs('src.metrics.query_log', level='WARNING') as logs:
+            self.assertEqual([('SELECT role', 3)], detector.check(shapes, '/user/all'))
+
+        self.assertEqual(1, len(logs.output))
+        self.assertIn('Possible N+1 on /user/all: 3 identical statements', logs.output[0])
+
+    def test_below_threshold(self):
+        detector = RepeatedQueryDetector(threshold=2)
+        self.assertEqual([], detector.check(Counter({'SELECT role': 2})))
+
+
+class TestQueryBudget(TestCase):
+
+    def setUp(self) -> None:
+        self.engine = create_engine('sqlite://')
+
+    def execute(self, *statements):
+        with self.engine.connect() as connection:
+            for statement in statements:
+                connection.execute(text(statement))
+
+    def test_within_budget(self):
+        with query_budget(self.engine, max_queries=2, max_repeated=1) as statements:
+            self.execute('SELECT 1', 'SELECT 2 + 2')
+
+        self.assertEqual(['SELECT 1', 'SELECT 2 + 2'], statements)
+
+    def test_max_queries(self):
+        with self.assertRaises(QueryBudgetExceeded) as raised:
+            with query_budget(self.engine, max_queries=1):
+                self.execute('SELECT 1', 'SELECT 2')
+
+        self.assertIn('2 queries issued, budget is 1', str(raised.exception))
+
+    def test_max_repeated(self):
+        with self.assertRaises(QueryBudgetExceeded) as raised:
+            with query_budget(self.engine, max_repeated=2):
+                self.execute('SELECT 1', 'SELECT 2', 'SELECT 3')
+
+        self.assertIn('3 identical statements issued, budget is 2: SELECT ?', str(raised.exception))
+
+    def test_is_an_assertion_error(self):
+        self.assertTrue(issubclass(QueryBudgetExceeded, AssertionError))
+
+    def test_listener_is_removed(self):
+        with query_budget(self.engine) as statements:
+            self.execute('SELECT 1')
+        self.execute('SELECT 2')
+
+        self.assertEqual(['SELECT 1'], statements)
@@ -0,0 +1,64 @@
+from unittest import TestCase
+from src.metrics.request_metrics import Histogram, RequestMetrics, RequestTimer
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestHistogram(TestCase):
+
+    def test_observe(self):
+        histogram = Histogram(buckets=(0.1, 1.0))
+        histogram.observe(0.05)
+        histogram.observe(0.1)
+        histogram.observe(0.5)
+        histogram.observe(3)
+
+        self.assertEqual([(0.1, 2), (1.0, 3), (float('inf'), 4)], list(histogram.cumulative()))
+        self.assertEqual(4, histogram.count)
+        self.assertAlmostEqual(3.65, histogram.sum)
+
+
+class TestRequestTimer(TestCase):
+
+    def setUp(self) -> None:
+        self.clock = FakeClock()
+        self.timer = RequestTimer(clock=self.clock)
+
+    def test_measure(self):
+        with self.timer.measure('auth'):
+            self.clock.now = 0.03
+        self.timer.add_query(0.002)
+        self.timer.add_query(0.003)
+        self.clock.now = 0.05
+
+        self.assertEqual(0.05, self.timer.elapsed())
+        self.assertEqual('db;dur=5.000;desc="2 queries", auth;dur=30.000, total;dur=50.000',
+                         self.timer.server_timing(self.timer.elapsed()))
+
+
+class TestRequestMetrics(TestCase):
+
+    def test_render(self):
+        metrics = RequestMetrics(buckets=(0.1,))
+        timer = RequestTimer()
+        timer.add_query(0.01)
+        timer.add('auth', 0.02)
+
+        metrics.observe('/product/all', 'GET', 200, timer, 0.05)
+        result = metrics.render({'product_cache': {'hits': 3, 'backend': 'local'}})
+
+        self.assertIn('http_request_duration_seconds_bucket{route="/product/all",method="GET",le="0.1"} 1', result)
+        self.assertIn('http_request_duration_seconds_bucket{route="/product/all",method="GET",le="+Inf"} 1', result)
+        self.assertIn('http_request_duration_seconds_count{route="/product/all",method="GET"} 1', result)
+        self.assertIn('http_responses_total{route="/product/all",method="GET",status="200"} 1', result)
+        self.assertIn('http_request_sql_queries_total{route="/product/all",method="GET"} 1', result)
+        self.assertIn('http_request_phase_seconds_total{route="/product/all",method="GET",phase="auth"} 0.02', result)
+        self.assertIn('product_cache_hits 3', result)
+        self.assertNotIn('backend', result)
@@ -0,0 +1,51 @@
+from unittest import TestCase
+
+from src.auth.role_registry import RoleRegistry
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRoleRegistry(TestCase):
+
+    def setUp(self) -> None:
+        self.clock = FakeClock()
+        self.registry = RoleRegistry(clock=self.clock)
+        self.clock.now = 5.0
+        self.registry.load([(1, 'user'), (2, 'admin')], source_version=3)
+
+    def test_load(self):
+        self.assertTrue(self.registry.loaded)
+        self.assertEqual(5.0, self.registry.loaded_at)
+        self.assertEqual(3, self.registry.source_version)
+        self.assertEqual({'user': 1, 'admin': 2}, self.registry.names())
+
+    def test_id(self):
+        self.assertEqual(2, self.registry.id('admin'))
+        self.assertIsNone(self.registry.id('owner'))
+
+    def test_ids(self):
+        self.assertEqual(frozenset({1, 2}), self.registry.ids(['user', 'admin', 'owner']))
+
+    def test_has_role(self):
+        self.assertTrue(self.registry.has_role(frozenset({2}), 'admin'))
+        self.assertFalse(self.registry.has_role(frozenset({1}), 'admin'))
+        self.assertFalse(self.registry.has_role(frozenset({1}), 'owner'))
+
+    def test_reload_replaces_roles(self):
+        self.registry.load([(1, 'user'), (3, 'owner')], source_version=4)
+
+        self.assertIsNone(self.registry.id('admin'))
+        self.assertEqual(3, self.registry.id('owner'))
+
+    def test_clear(self):
+        self.registry.clear()
+
+        self.assertFalse(self.registry.loaded)
+        self.assertIsNone(self.registry.id('user'))
@@ -0,0 +1,121 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import select, text, update
+
+from src.database.routing import RoutingSession, ReadYourWrites, replica_binds, is_write
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestReplicaBinds(TestCase):
+
+    def test_replica_binds(self):
+        binds = replica_binds('sqlite:////tmp/a.db, sqlite:////tmp/b.db,', {})
+
+        self.assertEqual(['replica_0', 'replica_1'], sorted(binds))
+        self.assertEqual('sqlite:////tmp/b.db', binds['replica_1']['url'])
+        self.assertEqual({'check_same_thread': False}, binds['replica_0']['connect_args'])
+
+    def test_no_replicas(self):
+        self.assertEqual({}, replica_binds('', {}))
+
+
+class TestReadYourWrites(TestCase):
+
+    def test_window(self):
+        clock = FakeClock()
+        tracker = ReadYourWrites(window=5, clock=clock)
+        tracker.record('127.0.0.1')
+
+        self.assertTrue(tracker.is_recent('127.0.0.1'))
+        self.assertFalse(tracker.is_recent('10.0.0.1'))
+        clock.now = 5
+        self.assertFalse(tracker.is_recent('127.0.0.1'))
+
+    def test_disabled(self):
+        tracker = ReadYourWrites(window=0)
+        tracker.record('127.0.0.1')
+
+        self.assertFalse(tracker.is_recent('127.0.0.1'))
+
+
+class TestRoutingSession(TestCase):
+    """A primary and a replica SQLite file holding different rows, so each read shows where it went."""
+
+    def setUp(self) -> None:
+        directory = tempfile.mkdtemp()
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(directory, 'primary.db')
+        self.app.config['SQLALCHEMY_BINDS'] = {'replica_0': 'sqlite:///' + os.path.join(directory, 'replica.db')}
+        self.db = SQLAlchemy(self.app, session_options={'class_': RoutingSession})
+
+        class Item(self.db.Model):
+            id = self.db.Column(self.db.Integer, primary_key=True)
+            name = self.db.Column(self.db.String(50))
+
+        self.Item = Item
+        with self.app.app_context():
+            for key in (None, 'replica_0'):
+                self.db.metadata.create_all(self.db.engines[key])
+                with self.db.engines[key].begin() as connection:
+                    connection.execute(Item.__table__.insert(), {'id': 1, 'name': key or 'primary'})
+
+    def names(self):
+        return self.db.session.execute(select(self.Item.name)).scalars().all()
+
+    def test_reads_use_primary_by_default(self):
+        with self.app.app_context():
+            self.assertEqual(['primary'], self.names())
+
+    def test_read_only_reads_use_replica(self):
+        with self.app.app_context():
+            self.db.session.info['read_only'] = True
+
+            self.assertEqual(['replica_0'], self.names())
+            self.assertEqual('replica_0', self.db.session.get(self.Item, 1).name)
+
+    def test_writes_use_primary_and_pin_the_session(self):
+        with self.app.app_context():
+            self.db.session.info['read_only'] = True
+            self.db.session.add(self.Item(id=2, name='new'))
+            self.db.session.commit()
+
+            self.assertEqual(['primary', 'new'], self.names())
+
+    def test_dml_uses_primary(self):
+        with self.app.app_context():
+            self.db.session.info['read_only'] = True
+            self.db.session.execute(update(self.Item).values(name='renamed'))
+            self.db.session.commit()
+
+            self.assertEqual(['renamed'], self.names())
+        with self.app.app_context():
+            self.db.session.info['read_only'] = True
+            self.assertEqual(['replica_0'], self.names())
+
+    def test_without_replicas(self):
+        with self.app.app_context():
+            self.db.engines.pop('replica_0').dispose()
+            self.db.session.info['read_only'] = True
+
+            self.assertEqual(['primary'], self.names())
+
+
+class TestIsWrite(TestCase):
+
+    def test_is_write(self):
+        self.assertFalse(is_write(None))
+        self.assertFalse(is_write(text('SELECT 1')))
+        self.assertFalse(is_write(select(text('1'))))
+        self.assertTrue(is_write(select(text('1')).with_for_update()))
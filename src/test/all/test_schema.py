@@ -0,0 +1,89 @@
+from unittest import TestCase
+
+from src.main import app
+from src.validation.schema import Schema, Field, integer, text
+
+
+class TestSchema(TestCase):
+
+    def setUp(self) -> None:
+        self.schema = Schema(
+            Field('id', required=True, type=integer, type_help='id should be a number'),
+            Field('title', required=True, help='title cannot be blank'),
+            Field('text')
+        )
+
+    def test_validate(self):
+        data, error = self.schema.validate({'id': '7', 'title': 'lamp', 'unknown': 'ignored'})
+
+        self.assertIsNone(error)
+        self.assertEqual({'id': 7, 'title': 'lamp', 'text': None}, data)
+
+    def test_missing_required_field(self):
+        data, error = self.schema.validate({'id': 7})
+
+        self.assertIsNone(data)
+        self.assertEqual([{'message': 'title cannot be blank', 'source': 'Field \'title\' in the request body.'}],
+                         error['errors'])
+        self.assertIn('traceId', error)
+
+    def test_null_required_field(self):
+        data, error = self.schema.validate({'id': 7, 'title': None})
+
+        self.assertEqual('title cannot be blank', error['errors'][0]['message'])
+
+    def test_default_help(self):
+        data, error = self.schema.validate({'title': 'lamp'})
+
+        self.assertEqual('id cannot be blank', error['errors'][0]['message'])
+
+    def test_invalid_type(self):
+        data, error = self.schema.validate({'id': 'seven', 'title': 'lamp'})
+
+        self.assertEqual([{'message': 'id should be a number', 'source': 'Field \'id\' in the request body.'}],
+                         error['errors'])
+
+    def test_body_should_be_an_object(self):
+        data, error = self.schema.validate(['lamp'])
+
+        self.assertEqual('Request body should be a JSON object.', error['errors'][0]['message'])
+
+    def test_parse_json(self):
+        with app.test_request_context(method='POST', json={'id': 1, 'title': 'lamp'}):
+            data, error = self.schema.parse()
+
+        self.assertEqual({'id': 1, 'title': 'lamp', 'text': None}, data)
+
+    def test_parse_form(self):
+        with app.test_request_context(method='POST', data={'id': '1', 'title': 'lamp'}):
+            data, error = self.schema.parse()
+
+        self.assertEqual({'id': 1, 'title': 'lamp', 'text': None}, data)
+
+    def test_parse_query_string(self):
+        with app.test_request_context('/?id=1&title=lamp', method='POST'):
+            data, error = self.schema.parse()
+
+        self.assertEqual({'id': 1, 'title': 'lamp', 'text': None}, data)
+
+    def test_parse_json_with_query_string(self):
+        with app.test_request_context('/?title=query&text=shade', method='POST', json={'id': 1, 'title': 'lamp'}):
+            data, error = self.schema.parse()
+
+        self.assertEqual({'id': 1, 'title': 'lamp', 'text': 'shade'}, data)
+
+
+class TestTypes(TestCase):
+
+    def test_text(self):
+        self.assertEqual('lamp', text('lamp'))
+        self.assertEqual('12', text(12))
+        self.assertRaises(ValueError, text, True)
+        self.assertRaises(ValueError, text, {'title': 'lamp'})
+
+    def test_integer(self):
+        self.assertEqual(12, integer(12))
+        self.assertEqual(12, integer('12'))
+        self.assertRaises(ValueError, integer, '-1')
+        self.assertRaises(ValueError, integer, False)
+        self.assertRaises(ValueError, integer, 1.5)
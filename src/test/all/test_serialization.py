@@ -0,0 +1,94 @@
+import datetime
+import json
+from unittest import TestCase, skipIf
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import Table, MetaData, Column, Integer, String, Numeric
+
+from src.main import Product, product_serializer, user_serializer
+from src.serialization.json_provider import OrjsonProvider, build_json_provider, orjson
+from src.serialization.model_serializer import ModelSerializer
+
+
+class TestModelSerializer(TestCase):
+
+    def test_fields_follow_the_table(self):
+        self.assertEqual(('id', 'title', 'text', 'state', 'category'), product_serializer.fields)
+        self.assertEqual(('id', 'username', 'firstname', 'lastname', 'email', 'password'), user_serializer.fields)
+
+    def test_dump(self):
+        product = Product(id=1, title='lamp', text='desk lamp', state='new', category='light', version=3)
+
+        self.assertEqual({'id': 1, 'title': 'lamp', 'text': 'desk lamp', 'state': 'new', 'category': 'light'},
+                         product_serializer.dump(product))
+
+    def test_dump_row(self):
+        self.assertEqual({'id': 1, 'title': 'lamp'}, product_serializer.dump_row((1, 'lamp'), ('id', 'title')))
+
+    def test_encode_rows(self):
+        rows = [(1, 'lamp', 'desk "lamp"', 'new', 'light'), (2, 'ламп', 'a\nb', 'used', '100%')]
+
+        encoded = product_serializer.encode_rows(rows)
+
+        self.assertEqual([dict(zip(product_serializer.fields, row)) for row in rows], json.loads(encoded))
+
+    def test_encode_rows_with_fields(self):
+        self.assertEqual('[{"id":1,"title":"lamp"}]', product_serializer.encode_rows([(1, 'lamp')], ('id', 'title')))
+
+    def test_encode_no_rows(self):
+        self.assertEqual('[]', product_serializer.encode_rows([]))
+
+    def test_encode_each(self):
+        self.assertEqual(['{"id":1}', '{"id":2}'], list(product_serializer.encode_each([(1,), (2,)], ('id',))))
+
+    def test_nullable_columns(self):
+        class Note:
+            __table__ = Table('note', MetaData(), Column('id', Integer, primary_key=True),
+                              Column('body', String(50), nullable=True), Column('stars', Integer, nullable=True),
+                              Column('price', Numeric))
+
+        serializer = ModelSerializer(Note)
+
+        self.assertEqual('[{"id":1,"body":null,"stars":null,"price":2.5}]',
+                         serializer.encode_rows([(1, None, None, 2.5)]))
+
+
+class TestJSONProvider(TestCase):
+
+    def setUp(self) -> None:
+        self.app = Flask(__name__)
+
+    def test_build_default(self):
+        self.assertIs(DefaultJSONProvider, type(build_json_provider(self.app, 'default')))
+
+    def test_build_unknown(self):
+        self.assertRaises(ValueError, build_json_provider, self.app, 'yaml')
+
+    @skipIf(orjson is None, 'orjson is not installed')
+    def test_build_auto(self):
+        self.assertIsInstance(build_json_provider(self.app, 'auto'), OrjsonProvider)
+
+    @skipIf(orjson is None, 'orjson is not installed')
+    def test_orjson_matches_default(self):
+        provider = OrjsonProvider(self.app)
+        obj = {'b': [1, 2.5, None, True], 'a': 'ламп', 'c': {'d': 'e'}}
+
+        self.assertEqual(json.loads(DefaultJSONProvider(self.app).dumps(obj)), json.loads(provider.dumps(obj)))
+        self.assertEqual(obj['b'], provider.loads(provider.dumps(obj))['b'])
+
+    @skipIf(orjson is None, 'orjson is not installed')
+    def test_orjson_uses_flask_defaults(self):
+        provider = OrjsonProvider(self.app)
+        when = datetime.datetime(2022, 1, 2, 3, 4, 5)
+
+        self.assertEqual(DefaultJSONProvider(self.app).dumps(when), provider.dumps(when))
+
+    @skipIf(orjson is None, 'orjson is not installed')
+    def test_orjson_response(self):
+        provider = OrjsonProvider(self.app)
+        with self.app.app_context():
+            response = provider.response({'id': 1})
+
+        self.assertEqual('application/json', response.mimetype)
+        self.assertEqual(b'{"id":1}\n', response.data)
@@ -0,0 +1,53 @@
+from unittest import mock
+
+from src.serve import parse_args, waitress_options, warmup
+from src.test.all.database import DatabaseTestCase
+
+
+class TestServe(DatabaseTestCase):
+
+    def test_parse_args_defaults(self):
+        args = parse_args([], environ={})
+
+        self.assertEqual(8080, args.port)
+        self.assertEqual(1, args.workers)
+        self.assertTrue(args.warmup)
+        self.assertEqual({'threads': 8, 'connection_limit': 200, 'channel_timeout': 30, 'backlog': 1024},
+                         waitress_options(args))
+
+    def test_parse_args_from_environment(self):
+        args = parse_args(['--threads', '16'], environ={'WAITRESS_THREADS': '4', 'SERVER_WORKERS': '3',
+                                                        'SERVER_ALLOW_LOCAL_STATE': '1', 'WAITRESS_BACKLOG': '64',
+                                                        'PORT': '9000'})
+
+        self.assertEqual(16, args.threads)
+        self.assertEqual(3, args.workers)
+        self.assertEqual(64, args.backlog)
+        self.assertEqual(9000, args.port)
+
+    def test_prefork_requires_acknowledging_local_state(self):
+        with mock.patch('sys.stderr'), self.assertRaises(SystemExit):
+            parse_args(['--workers', '2'], environ={})
+
+        self.assertEqual(2, parse_args(['--workers', '2', '--allow-local-state'], environ={}).workers)
+
+    def test_warmup_loads_roles(self):
+        with self.count_queries() as statements:
+            warmup()
+
+        self.assertTrue([statement for statement in statements if 'FROM role' in statement])
+
+    @mock.patch('src.serve.atexit.register')
+    @mock.patch('src.serve.password_hasher')
+    @mock.patch('src.serve.serve')
+    @mock.patch('src.serve.warmup')
+    def test_main_runs_single_process(self, mock_warmup, mock_serve, mock_password_hasher, mock_register):
+        from src.serve import main, app
+
+        main(['--port', '9000', '--threads', '2'])
+
+        mock_warmup.assert_called_once_with()
+        mock_password_hasher.start.assert_called_once_with()
+        mock_register.assert_called_once_with(mock_password_hasher.shutdown)
+        mock_serve.assert_called_once_with(app, host='0.0.0.0', port=9000, threads=2, connection_limit=200,
+                                           channel_timeout=30, backlog=1024)
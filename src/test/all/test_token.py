@@ -0,0 +1,64 @@
+from unittest import TestCase, mock
+from src.auth.token import TokenIssuer, TokenDenyList
+
+
+class TestTokenIssuer(TestCase):
+
+    def setUp(self) -> None:
+        self.issuer = TokenIssuer('secret', max_age=60)
+
+    def test_issue_and_verify(self):
+        token = self.issuer.issue('username', ['user', 'admin'])
+
+        result = self.issuer.verify(token)
+
+        self.assertEqual('username', result['sub'])
+        self.assertEqual(['user', 'admin'], result['roles'])
+        self.assertTrue(result['jti'])
+        self.assertTrue(result['exp'])
+
+    def test_verify_with_tampered_token(self):
+        token = self.issuer.issue('username', ['user'])
+
+        result = self.issuer.verify(token[:-2] + 'xx')
+
+        self.assertIsNone(result)
+
+    def test_verify_with_other_secret(self):
+        token = TokenIssuer('other').issue('username', ['admin'])
+
+        result = self.issuer.verify(token)
+
+        self.assertIsNone(result)
+
+    def test_verify_with_expired_token(self):
+        token = self.issuer.issue('username', ['user'])
+
+        with mock.patch('itsdangerous.timed.time.time', return_value=10 ** 10):
+            result = self.issuer.verify(token)
+
+        self.assertIsNone(result)
+
+    def test_verify_with_empty_token(self):
+        self.assertIsNone(self.issuer.verify(''))
+
+
+class TestTokenDenyList(TestCase):
+
+    def setUp(self) -> None:
+        self.now = 100.0
+        self.deny_list = TokenDenyList(clock=lambda: self.now)
+
+    def test_revoke(self):
+        self.deny_list.revoke('jti', 200.0)
+
+        self.assertTrue(self.deny_list.is_revoked('jti'))
+        self.assertFalse(self.deny_list.is_revoked('other'))
+
+    def test_expired_entries_are_purged(self):
+        self.deny_list.revoke('old', 150.0)
+        self.now = 160.0
+        self.deny_list.revoke('new', 300.0)
+
+        self.assertFalse(self.deny_list.is_revoked('old'))
+        self.assertEqual(1, len(self.deny_list))
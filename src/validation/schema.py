@@ -0,0 +1,67 @@
+from flask import request
+
+from src.error_handler.exception_wrapper import handle_error_format
+
+
+def text(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    raise ValueError
+
+
+def integer(value):
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    raise ValueError
+
+
+class Field:
+
+    def __init__(self, name: str, required: bool = False, help: str = None, type=text, type_help: str = None):
+        self.name = name
+        self.required = required
+        self.help = help or '{0} cannot be blank'.format(name)
+        self.type = type
+        self.type_help = type_help or '{0} has an invalid value'.format(name)
+
+
+class Schema:
+    """Request body validator compiled once from its fields, returning handle_error_format errors."""
+
+    def __init__(self, *fields: Field):
+        self.fields = fields
+        self._checks = tuple((field.name, field.required, field.type,
+                              'Field \'{0}\' in the request body.'.format(field.name), field.help, field.type_help)
+                             for field in fields)
+
+    def validate(self, body):
+        if not isinstance(body, dict):
+            return None, handle_error_format('Request body should be a JSON object.', 'Request body.')
+
+        data = {}
+        for name, required, convert, source, help, type_help in self._checks:
+            value = body.get(name)
+            if value is None:
+                if required:
+                    return None, handle_error_format(help, source)
+                data[name] = None
+                continue
+            try:
+                data[name] = convert(value)
+            except (TypeError, ValueError):
+                return None, handle_error_format(type_help, source)
+        return data, None
+
+    def parse(self):
+        """Validates the JSON body, with query string and form values filling fields it lacks, like reqparse."""
+        body = request.get_json(silent=True)
+        values = request.values
+        if body is None:
+            return self.validate(values)
+        if isinstance(body, dict) and values:
+            body = dict(values.to_dict(), **body)
+        return self.validate(body)